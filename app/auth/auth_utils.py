@@ -1,24 +1,40 @@
 import jwt
 from fastapi import HTTPException
-from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from decouple import config
 from typing import Optional
+from app.auth.password_hasher import hash_password, verify_password
+from app.auth.jwt_cache import verified_token_cache
 
 JWT_KEY = config("JWT_KEY")
 ACCESS_TOKEN_EXPIRE_MINUTES = config("ACCESS_TOKEN_EXPIRE_MINUTES", cast=int)
+# 有効期間のこの割合を過ぎたトークンだけ再発行する（0なら毎回再発行）
+JWT_RENEW_AFTER_FRACTION = config("JWT_RENEW_AFTER_FRACTION", default=0.5, cast=float)
+
+_pwd_ctx = None
+
+
+def _get_pwd_ctx():
+    """passlib/bcryptはサインアップ・ログインでしか使わないので初回利用時に読み込む"""
+    global _pwd_ctx
+    if _pwd_ctx is None:
+        from passlib.context import CryptContext
+
+        _pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_ctx
 
 
 class AuthJwtCsrf:
-    pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
     secret_key = JWT_KEY
     access_token_expire_minutes = ACCESS_TOKEN_EXPIRE_MINUTES
+    renew_after_fraction = JWT_RENEW_AFTER_FRACTION
 
     def generate_hashed_pw(self, password) -> str:
-        return self.pwd_ctx.hash(password)
+        # bcryptは専用プールで実行する（混雑時はPasswordHasherBusyError）
+        return hash_password(password)
 
     def verify_pw(self, plain_pw, hashed_pw) -> bool:
-        return self.pwd_ctx.verify(plain_pw, hashed_pw)
+        return verify_password(plain_pw, hashed_pw)
 
     def encode_jwt(self, username) -> str:
         payload = {
@@ -31,40 +47,71 @@ class AuthJwtCsrf:
         }
         return jwt.encode(payload, self.secret_key, algorithm="HS256")
 
-    def decode_jwt(self, token) -> str:
+    def decode_jwt_claims(self, token) -> tuple[str, int]:
+        """検証済みの (sub, exp) を返す。検証済みキャッシュにあれば署名検証を省く"""
+        cached = verified_token_cache.get(token)
+        if cached is not None:
+            return cached
         try:
-            payload = jwt.decode(token, self.secret_key, algorithms=["HS256"])
-            return payload["sub"]
+            payload = jwt.decode(
+                token,
+                self.secret_key,
+                algorithms=["HS256"],
+                options={"require": ["exp", "sub"]},
+            )
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="The JWT has expired")
         except jwt.InvalidTokenError as e:
             raise HTTPException(status_code=401, detail="JWT is not valid")
+        subject, exp = payload["sub"], payload["exp"]
+        verified_token_cache.put(token, subject, exp)
+        return subject, exp
 
-    def verify_jwt(self, request) -> str:
+    def decode_jwt(self, token) -> str:
+        subject, _ = self.decode_jwt_claims(token)
+        return subject
+
+    def _verify_jwt_claims(self, request) -> tuple[str, int]:
         token = request.cookies.get("access_token")
         if not token:
             raise HTTPException(
                 status_code=401, detail="No JWT exist: may not set yet or deleted"
             )
         _, _, value = token.partition(" ")
-        subject = self.decode_jwt(value)
+        return self.decode_jwt_claims(value)
+
+    def verify_jwt(self, request) -> str:
+        subject, _ = self._verify_jwt_claims(request)
         return subject
 
-    def verify_update_jwt(self, request) -> tuple[str, str]:
-        subject = self.verify_jwt(request)
-        new_token = self.encode_jwt(subject)  # jWTを生成し直す
-        return new_token, subject
+    def needs_renewal(self, exp: int) -> bool:
+        """有効期間のrenew_after_fractionを使い切ったトークンならTrue（スライディングセッション）"""
+        lifetime = self.access_token_expire_minutes * 60
+        remaining = exp - datetime.now(timezone.utc).timestamp()
+        return remaining <= lifetime * (1 - self.renew_after_fraction)
+
+    def _renewed_token(self, subject: str, exp: int) -> Optional[str]:
+        # 再発行が不要ならNone（Cookieも設定しない）
+        if self.needs_renewal(exp):
+            return self.encode_jwt(subject)  # jWTを生成し直す
+        return None
+
+    def verify_update_jwt(self, request) -> tuple[Optional[str], str]:
+        """JWTを検証し、期限が近ければ再発行したトークンも返す（不要ならNone）"""
+        subject, exp = self._verify_jwt_claims(request)
+        return self._renewed_token(subject, exp), subject
 
-    def verify_csrf_update_jwt(self, request, csrf_protect, headers) -> tuple[str, str]:
+    def verify_csrf_update_jwt(
+        self, request, csrf_protect, headers
+    ) -> tuple[Optional[str], str]:
         # CSRF
         csrf_token = csrf_protect.get_csrf_from_headers(headers)
         csrf_protect.validate_csrf(
             csrf_token
         )  # 例外処理が発生しなければCSRFトークンが有効
-        # JWT
-        subject = self.verify_jwt(request)
-        new_token = self.encode_jwt(subject)
-        return new_token, subject
+        # JWT（期限が近い場合だけ再発行）
+        subject, exp = self._verify_jwt_claims(request)
+        return self._renewed_token(subject, exp), subject
 
     def get_current_user_optional(self, request) -> Optional[str]:
         """オプショナルなJWT認証（失敗してもNoneを返す）"""
@@ -11,8 +11,11 @@ class CookieManager:
     is_local: bool = os.getenv("IS_LOCAL", "false").lower() == "true"
     access_token_expire_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES
 
-    def set_jwt_cookie(self, response: Response, token: str) -> None:
-        """JWT用クッキーの設定"""
+    def set_jwt_cookie(self, response: Response, token: Optional[str]) -> None:
+        """JWT用クッキーの設定（tokenがNone＝再発行不要なら何もしない）"""
+        if token is None:
+            return
+
         cookie_settings = {
             "key": "access_token",
             "value": f"Bearer {token}",
@@ -0,0 +1,79 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from decouple import config
+from app.cache import register_cache
+
+# 検証済みJWTのキャッシュサイズ（0で無効）
+JWT_DECODE_CACHE_SIZE = config("JWT_DECODE_CACHE_SIZE", default=1024, cast=int)
+
+
+class VerifiedTokenCache:
+    """署名検証に成功したJWTを (sub, exp) で覚えておくLRUキャッシュ
+
+    同じCookieが短時間に何度も送られてくるので、2回目以降は署名検証と
+    クレームの解析を省いて辞書引きだけにする。
+    - キーはトークンのSHA-256（トークン自体は保持しない）
+    - expを過ぎたエントリは返さずに破棄する（PyJWTと同じく exp <= now で失効）
+    - 検証に失敗したトークンは保存しない
+    """
+
+    def __init__(self, maxsize: int = JWT_DECODE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, tuple[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[tuple[str, int]]:
+        """有効期限内の (sub, exp) を返す。なければNone"""
+        if self.maxsize <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                # 期限切れは通常の検証に回して、期限切れエラーにする
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, subject: str, exp: int) -> None:
+        if self.maxsize <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (subject, exp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": size,
+            "maxsize": self.maxsize,
+        }
+
+
+verified_token_cache = VerifiedTokenCache()
+register_cache("verified_jwt", verified_token_cache)
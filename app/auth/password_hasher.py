@@ -0,0 +1,104 @@
+import multiprocessing
+import threading
+from typing import Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from decouple import config
+import logging
+from app.exceptions import PasswordHasherBusyError
+
+logger = logging.getLogger(__name__)
+
+# bcryptは1回200ms程度CPUを使うので、リクエストを処理するスレッドとは別の
+# 上限付きプールで実行する。待ちが上限を超えたら受け付けずに503を返す。
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=2, cast=int)
+PASSWORD_HASH_MAX_PENDING = config("PASSWORD_HASH_MAX_PENDING", default=16, cast=int)
+# process: GILと競合しない別プロセスで実行 / thread: プロセスを作れない環境用
+# （Lambdaは/dev/shmが無くmultiprocessingのキューが使えないのでthreadにする）
+PASSWORD_HASH_EXECUTOR = config("PASSWORD_HASH_EXECUTOR", default="process")
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+_rejected = 0
+
+
+def _hash(password: str) -> str:
+    from app.auth.auth_utils import _get_pwd_ctx
+
+    return _get_pwd_ctx().hash(password)
+
+
+def _verify(plain_pw: str, hashed_pw: str) -> bool:
+    from app.auth.auth_utils import _get_pwd_ctx
+
+    return _get_pwd_ctx().verify(plain_pw, hashed_pw)
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = _create_executor()
+    return _executor
+
+
+def _create_executor() -> Executor:
+    if PASSWORD_HASH_EXECUTOR == "process":
+        try:
+            # スレッドを持つ親プロセスからのforkを避けてspawnで起動する
+            return ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        except (OSError, NotImplementedError) as e:
+            logger.warning(
+                f"[AUTH] Process pool unavailable, falling back to threads: error={str(e)}"
+            )
+    return ThreadPoolExecutor(
+        max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+    )
+
+
+def _run(fn, *args):
+    """上限内ならプールで実行して結果を待つ。上限を超えていればPasswordHasherBusyError"""
+    global _pending, _rejected
+    with _pending_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            _rejected += 1
+            logger.warning(
+                f"[AUTH] Password hasher saturated: pending={_pending}, limit={PASSWORD_HASH_MAX_PENDING}"
+            )
+            raise PasswordHasherBusyError(
+                message="ただいま混み合っています。しばらく待ってから再試行してください。"
+            )
+        _pending += 1
+
+    try:
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+def hash_password(password: str) -> str:
+    return _run(_hash, password)
+
+
+def verify_password(plain_pw: str, hashed_pw: str) -> bool:
+    return _run(_verify, plain_pw, hashed_pw)
+
+
+def get_password_hasher_stats() -> dict:
+    """実行中＋待ち件数と、待ち行列の長さ（実行中を除く）"""
+    with _pending_lock:
+        pending = _pending
+    return {
+        "executor": PASSWORD_HASH_EXECUTOR,
+        "workers": PASSWORD_HASH_WORKERS,
+        "in_flight": pending,
+        "queue_depth": max(pending - PASSWORD_HASH_WORKERS, 0),
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "rejected": _rejected,
+    }
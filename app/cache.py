@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 生成したキャッシュを名前で管理（統計情報の取得用）
+_registry: dict[str, Any] = {}
+
+
+class _KeyLoad:
+    """キーごとの読み込み状態（読み込み中・待機中の呼び出し元がいる間だけ保持する）"""
+
+    __slots__ = ("lock", "generation", "users")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.users = 0
+
+
+class TTLCache:
+    """TTLとLRUで上限管理するプロセス内キャッシュ
+
+    モジュールスコープで生成すれば、Lambdaのウォームスタート間でも保持される。
+    期限切れのキーは1つの呼び出し元だけが再読み込みし（single-flight）、
+    古い値がある間は他の呼び出し元にその値を返す。
+    読み込み中に破棄されたキーは世代番号が進むので、読み込んだ（書き込み前の）
+    値は保存せずに捨てる。キーごとのロックと世代番号は、そのキーの呼び出し元が
+    いなくなった時点で削除するので、キーの種類が多くても増え続けない。
+    """
+
+    def __init__(self, name: str, maxsize: int = 128, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._loads: dict[Hashable, _KeyLoad] = {}
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def _lookup(self, key: Hashable) -> Optional[tuple[float, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _enter_load(self, key: Hashable) -> _KeyLoad:
+        with self._lock:
+            load = self._loads.get(key)
+            if load is None:
+                load = self._loads[key] = _KeyLoad()
+            load.users += 1
+            return load
+
+    def _exit_load(self, key: Hashable, load: _KeyLoad) -> None:
+        with self._lock:
+            load.users -= 1
+            if load.users == 0:
+                # 待っている呼び出し元がいなければ、ロックと世代番号も破棄する
+                del self._loads[key]
+
+    def _generation(self, load: _KeyLoad) -> int:
+        with self._lock:
+            return load.generation
+
+    def _bump_loading_generations(self, keys) -> None:
+        # 読み込み中・待機中のキーだけ世代を進める（_lock保持中に呼ぶ）
+        for key in keys:
+            load = self._loads.get(key)
+            if load is not None:
+                load.generation += 1
+
+    def _store(
+        self, key: Hashable, value: Any, load: _KeyLoad, generation: int
+    ) -> None:
+        with self._lock:
+            if load.generation != generation:
+                # 読み込み中に破棄された。古い可能性がある値は保存しない
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """キャッシュから取得し、なければloaderで読み込んで保存する"""
+        entry = self._lookup(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        load = self._enter_load(key)
+        try:
+            if entry is not None and not load.lock.acquire(blocking=False):
+                # 他の呼び出し元が再読み込み中なので、期限切れの値をそのまま返す
+                self.hits += 1
+                return entry[1]
+            if entry is None:
+                load.lock.acquire()
+
+            try:
+                # ロック待ちの間に他の呼び出し元が読み込んでいれば、それを使う
+                entry = self._lookup(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self.hits += 1
+                    return entry[1]
+
+                generation = self._generation(load)
+                self.misses += 1
+                value = loader()
+                self._store(key, value, load, generation)
+                return value
+            finally:
+                load.lock.release()
+        finally:
+            self._exit_load(key, load)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """指定キー（省略時は全件）を破棄する（読み込み中の値も保存させない）"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bump_loading_generations(list(self._loads))
+            else:
+                self._entries.pop(key, None)
+                self._bump_loading_generations([key])
+
+    def invalidate_matching(self, predicate: Callable[[Hashable, Any], bool]) -> None:
+        """predicate(key, value)がTrueになるエントリを破棄する
+
+        読み込み中のキーはまだ値がなく判定できないので、すべて保存させない。
+        """
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items() if predicate(k, v)]:
+                del self._entries[key]
+            self._bump_loading_generations(list(self._loads))
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
+
+
+def register_cache(name: str, cache: Any) -> None:
+    """TTLCache以外のキャッシュ（stats()を持つもの）も統計情報の対象にする"""
+    _registry[name] = cache
+
+
+def get_cache_stats() -> dict[str, dict]:
+    """全キャッシュのヒット/ミス数を返す"""
+    return {name: cache.stats() for name, cache in _registry.items()}
@@ -0,0 +1,127 @@
+import gzip
+from typing import Iterable, Optional
+from decouple import config, Csv
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotliが無い環境ではgzipのみ
+    brotli = None
+
+# 圧縮の設定（小さいレスポンスは圧縮しても効果が薄いので閾値未満はそのまま返す）
+# API Gateway経由（Lambda）では圧縮をAPI Gatewayに任せるので無効にする
+COMPRESSION_ENABLED = config("COMPRESSION_ENABLED", default=True, cast=bool)
+COMPRESSION_MINIMUM_SIZE = config("COMPRESSION_MINIMUM_SIZE", default=1024, cast=int)
+COMPRESSION_GZIP_LEVEL = config("COMPRESSION_GZIP_LEVEL", default=6, cast=int)
+COMPRESSION_BROTLI_QUALITY = config("COMPRESSION_BROTLI_QUALITY", default=4, cast=int)
+COMPRESSION_CONTENT_TYPES = config(
+    "COMPRESSION_CONTENT_TYPES",
+    default="application/json,text/plain,text/html",
+    cast=Csv(),
+)
+
+
+def _accepted_encodings(accept_encoding: str) -> set[str]:
+    """Accept-Encodingから受け入れ可能（q>0）なエンコーディングを取り出す"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(name)
+    return accepted
+
+
+class CompressionMiddleware:
+    """レスポンスをbrotli（利用可能なら）またはgzipで圧縮するASGIミドルウェア
+
+    ボディをまとめてから圧縮するので、Content-Lengthを正しく付け直せる。
+    uvicornなどで直接配信する場合用。Lambdaでは API Gateway の
+    minimumCompressionSize で圧縮する（serverless.yml）。
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = COMPRESSION_BROTLI_QUALITY,
+        content_types: Iterable[str] = COMPRESSION_CONTENT_TYPES,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.content_types = frozenset(t.strip().lower() for t in content_types)
+
+    def _choose_encoding(self, scope: Scope) -> Optional[str]:
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _should_compress(self, start: Message, headers: MutableHeaders, body: bytes):
+        if start["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type not in self.content_types:
+            return False
+        return len(body) >= self.minimum_size
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        body_parts: list[bytes] = []
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(body_parts)
+            headers = MutableHeaders(raw=start_message["headers"])
+            if self._should_compress(start_message, headers, body):
+                body = self._compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,13 +1,69 @@
+import atexit
+import copy
 import logging
 import logging.config
 import json
 import os
-from datetime import datetime
-from typing import Dict, Any
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Optional
+
+# LogRecordの標準属性（これ以外はextra={...}で渡された値として扱う）
+_RESERVED_RECORD_ATTRS = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", (), None))
+) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1JSONのフォーマッター（本番用）
+
+    extra={...}で渡した値は、型を保ったままトップレベルのキーとして出力する。
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc)
+            .isoformat(timespec="milliseconds")
+            .replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            payload["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """キューに積むだけのハンドラー
+
+    呼び出し元では%展開だけ行い（引数のその時点の値を残すため）、
+    フォーマット・例外の整形・stdoutへの書き込みはリスナースレッドで行う。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
 
 
 class LoggingConfig:
-    """ログ設定クラス（シンプル版）"""
+    """ログ設定クラス（シンプル版）
+
+    ログはキュー経由でリスナースレッドが書き出すので、リクエスト処理の
+    スレッドはstdoutへの書き込みを待たない。Lambdaではレスポンスを返すと
+    プロセスが凍結されるので、呼び出しごとにflush()でキューを空にする。
+    """
+
+    _queue: Optional[queue.Queue] = None
+    _listener: Optional[QueueListener] = None
 
     @staticmethod
     def get_log_level() -> str:
@@ -26,13 +82,14 @@ class LoggingConfig:
         log_level = LoggingConfig.get_log_level()
         environment = LoggingConfig.get_environment()
 
-        # 既存のハンドラーをクリア
+        # 既存のハンドラーとリスナーをクリア
+        LoggingConfig.shutdown()
         root_logger = logging.getLogger()
         if root_logger.handlers:
-            for handler in root_logger.handlers:
+            for handler in list(root_logger.handlers):
                 root_logger.removeHandler(handler)
 
-        # ハンドラーとフォーマッターを設定
+        # 実際に書き出すハンドラー（リスナースレッドから呼ばれる）
         handler = logging.StreamHandler()
 
         if environment == "development":
@@ -42,16 +99,19 @@ class LoggingConfig:
                 datefmt="%H:%M:%S",  # 時分秒のみで十分
             )
         else:
-            # 本番環境: 基本的なログ形式（後で構造化ログに変更予定）
-            formatter = logging.Formatter(
-                "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-                datefmt="%Y-%m-%d %H:%M:%S",
-            )
+            # 本番環境: 構造化ログ（CloudWatch Logs Insightsでextraのキーを検索できる）
+            formatter = JsonFormatter()
 
         handler.setFormatter(formatter)
 
-        # ルートロガーに設定
-        root_logger.addHandler(handler)
+        # ルートロガーにはキューに積むハンドラーだけを設定
+        log_queue: queue.Queue = queue.Queue()
+        listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        listener.start()
+        LoggingConfig._queue = log_queue
+        LoggingConfig._listener = listener
+
+        root_logger.addHandler(_DeferredQueueHandler(log_queue))
         root_logger.setLevel(getattr(logging, log_level))
 
         # アプリケーション専用ロガーを返す
@@ -59,7 +119,35 @@ class LoggingConfig:
 
         # 初期化完了ログ
         app_logger.info(
-            f"Logging configuration initialized - Environment: {environment}, Level: {log_level}"
+            "Logging configuration initialized - Environment: %s, Level: %s",
+            environment,
+            log_level,
         )
 
         return app_logger
+
+    @staticmethod
+    def flush(timeout: float = 2.0) -> None:
+        """キューに溜まったログを書き出し終わるまで待つ（Lambdaの凍結前に呼ぶ）"""
+        log_queue = LoggingConfig._queue
+        if log_queue is None or LoggingConfig._listener is None:
+            return
+        with log_queue.all_tasks_done:
+            log_queue.all_tasks_done.wait_for(
+                lambda: not log_queue.unfinished_tasks, timeout=timeout
+            )
+        for handler in LoggingConfig._listener.handlers:
+            handler.flush()
+
+    @staticmethod
+    def shutdown() -> None:
+        """リスナースレッドを止める（残っているログは書き出してから止まる）"""
+        listener = LoggingConfig._listener
+        if listener is None:
+            return
+        LoggingConfig._listener = None
+        LoggingConfig._queue = None
+        listener.stop()
+
+
+atexit.register(LoggingConfig.shutdown)
@@ -7,23 +7,35 @@ from app.exceptions import (
     DatabaseError,
 )
 
-
 logger = logging.getLogger(__name__)
 
 
+# カテゴリは1つのパーティション（CATEGORY#ALL）にまとめて保存し、Queryで取得する
+CATEGORY_REGISTRY_PK = "CATEGORY#ALL"
+
+
 def db_get_categories():
     logger.info("[CRUD] Getting all categories")
     try:
-        response = table.scan(
-            FilterExpression=Key("PK").begins_with("CATEGORY#") & Key("SK").eq("META")
-        )
-        items = response.get("Items", [])
+        query_params = {
+            "KeyConditionExpression": Key("PK").eq(CATEGORY_REGISTRY_PK)
+            & Key("SK").begins_with("CATEGORY#"),
+        }
+
+        # 1MBを超えた場合に備えてLastEvaluatedKeyがなくなるまで取得
+        items = []
+        while True:
+            response = table.query(**query_params)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                break
+            query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
 
         # カテゴリデータの変換
         categories = []
         for item in items:
             try:
-                category = {"id": item["PK"].split("#")[1], "name": item["name"]}
+                category = {"id": item["SK"].split("#", 1)[1], "name": item["name"]}
                 categories.append(category)
             except KeyError as e:
                 logger.warning(
@@ -32,7 +44,7 @@ def db_get_categories():
                 continue
 
         logger.info(
-            f"[CRUD] Categories retrieved successfully: count={len(categories)}"
+            "[CRUD] Categories retrieved successfully: count=%s", len(categories)
         )
         return categories
 
@@ -41,7 +53,7 @@ def db_get_categories():
         error_message = e.response["Error"]["Message"]
 
         logger.error(
-            f"[CRUD] DynamoDB scan error for categories: error_code={error_code}, message={error_message}",
+            f"[CRUD] DynamoDB query error for categories: error_code={error_code}, message={error_message}",
             exc_info=True,
         )
 
@@ -1,9 +1,10 @@
 from boto3.dynamodb.conditions import Key
 from app.database import table
-from typing import Union, List
+from typing import Union, Any, Optional
+import os
 import uuid
 from datetime import datetime, timezone
-from .crud_post import db_get_single_post
+from .crud_post import invalidate_feed_cache
 from fastapi import HTTPException
 import logging
 from botocore.exceptions import ClientError
@@ -13,26 +14,55 @@ from app.exceptions import (
     CommentRetrievalError,
     CommentNotFoundError,
     CommentDeletionError,
+    CommentOwnershipError,
     DatabaseError,
 )
 
 logger = logging.getLogger(__name__)
 
 
+def _new_comment_id(created_at: datetime) -> str:
+    """作成時刻（ミリ秒）を先頭48bitに持つUUIDv7を生成する
+
+    SKがCOMMENT#<comment_id>なので、IDの辞書順がそのまま作成順になる。
+    """
+    timestamp_ms = int(created_at.timestamp() * 1000)
+    value = (timestamp_ms & ((1 << 48) - 1)) << 80
+    value |= int.from_bytes(os.urandom(10), "big") & ((1 << 80) - 1)
+    value &= ~(0xF << 76)
+    value |= 0x7 << 76  # version 7
+    value &= ~(0x3 << 62)
+    value |= 0x2 << 62  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
+
+def _comment_counter_update(post_id: str, delta: int) -> dict:
+    """投稿METAのコメント数を増減するトランザクション要素"""
+    return {
+        "Update": {
+            "TableName": table.table_name,
+            "Key": {"PK": f"POST#{post_id}", "SK": "META"},
+            "UpdateExpression": "ADD comment_count :delta",
+            "ConditionExpression": "attribute_exists(PK)",
+            "ExpressionAttributeValues": {":delta": delta},
+        }
+    }
+
+
+def _cancellation_reasons(error: ClientError) -> list[Optional[str]]:
+    # CancellationReasonsはTransactItemsと同じ順序で返る
+    return [
+        reason.get("Code") for reason in error.response.get("CancellationReasons", [])
+    ]
+
+
 def db_create_comment(username: str, post_id: str, data: dict) -> dict:
-    logger.info(f"[CRUD] Creating comment: username={username}, post_id={post_id}")
+    logger.info("[CRUD] Creating comment: username=%s, post_id=%s", username, post_id)
 
     try:
-        # 投稿の存在確認
-        post = db_get_single_post(post_id)
-        if not post:
-            logger.warning(
-                f"[CRUD] Comment creation failed - post not found: post_id={post_id}"
-            )
-            raise PostNotFoundError(message=f"投稿ID '{post_id}' が存在しません。")
-
-        comment_id = str(uuid.uuid4())
-        now = datetime.now(timezone.utc).isoformat()
+        created_at = datetime.now(timezone.utc)
+        comment_id = _new_comment_id(created_at)
+        now = created_at.isoformat()
 
         item = {
             "PK": f"POST#{post_id}",
@@ -43,7 +73,23 @@ def db_create_comment(username: str, post_id: str, data: dict) -> dict:
             "created_at": now,  # commentの編集機能は作らないので、updated_atは不要
         }
 
-        table.put_item(Item=item)
+        # コメントの追加と投稿METAのコメント数加算を同一トランザクションで実行
+        # META更新の条件（attribute_exists）が投稿の存在確認を兼ねるので事前の読み取りは不要
+        table.meta.client.transact_write_items(
+            TransactItems=[
+                {
+                    "Put": {
+                        "TableName": table.table_name,
+                        "Item": item,
+                        "ConditionExpression": "attribute_not_exists(SK)",
+                    }
+                },
+                _comment_counter_update(post_id, 1),
+            ]
+        )
+
+        # キャッシュ済みの1ページ目のコメント数を古いままにしない
+        invalidate_feed_cache(post_id)
 
         result = {
             "comment_id": comment_id,
@@ -54,20 +100,30 @@ def db_create_comment(username: str, post_id: str, data: dict) -> dict:
         }
 
         logger.info(
-            f"[CRUD] Comment created successfully: comment_id={comment_id}, post_id={post_id}"
+            "[CRUD] Comment created successfully: comment_id=%s, post_id=%s",
+            comment_id,
+            post_id,
         )
         return result
 
-    except PostNotFoundError:
-        # 投稿未発見エラーは再スロー
-        raise
-
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
 
+        if error_code == "TransactionCanceledException":
+            reasons = _cancellation_reasons(e)
+            if len(reasons) > 1 and reasons[1] == "ConditionalCheckFailed":
+                # 投稿METAが存在しない（未作成・削除済み）
+                logger.warning(
+                    f"[CRUD] Comment creation failed - post not found: post_id={post_id}"
+                )
+                raise PostNotFoundError(
+                    message=f"投稿ID '{post_id}' が存在しません。",
+                    original_error=e,
+                )
+
         logger.error(
-            f"[CRUD] DynamoDB put_item error for comment: username={username}, post_id={post_id}, error_code={error_code}, message={error_message}",
+            f"[CRUD] DynamoDB transact_write_items error for comment: username={username}, post_id={post_id}, error_code={error_code}, message={error_message}",
             exc_info=True,
         )
 
@@ -98,15 +154,31 @@ def db_create_comment(username: str, post_id: str, data: dict) -> dict:
         )
 
 
-def db_get_comments(post_id: str) -> List[dict]:
-    logger.info(f"[CRUD] Getting comments for post: post_id={post_id}")
+# 降順＝新しい順にソート（comment_idが時刻順のUUIDv7なのでSKの降順で取得）
+def db_get_comments(
+    post_id: str, limit: int = 10, last_evaluated_key: dict = None
+) -> dict[str, Any]:
+    logger.info(
+        "[CRUD] Getting comments for post: post_id=%s, limit=%s, has_last_key=%s",
+        post_id,
+        limit,
+        last_evaluated_key is not None,
+    )
 
     try:
-        response = table.query(
-            KeyConditionExpression=Key("PK").eq(f"POST#{post_id}")
-            & Key("SK").begins_with("COMMENT#")
-        )
+        query_params = {
+            "KeyConditionExpression": Key("PK").eq(f"POST#{post_id}")
+            & Key("SK").begins_with("COMMENT#"),
+            "Limit": limit,
+            "ScanIndexForward": False,
+        }
+
+        if last_evaluated_key:
+            query_params["ExclusiveStartKey"] = last_evaluated_key
+
+        response = table.query(**query_params)
         items = response.get("Items", [])
+        last_key = response.get("LastEvaluatedKey")
 
         # コメントデータの変換
         comments = []
@@ -127,9 +199,12 @@ def db_get_comments(post_id: str) -> List[dict]:
                 continue
 
         logger.info(
-            f"[CRUD] Comments retrieved successfully: post_id={post_id}, count={len(comments)}"
+            "[CRUD] Comments retrieved successfully: post_id=%s, count=%s, has_more=%s",
+            post_id,
+            len(comments),
+            last_key is not None,
         )
-        return comments
+        return {"comments": comments, "last_evaluated_key": last_key}
 
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
@@ -169,7 +244,7 @@ def db_get_comments(post_id: str) -> List[dict]:
 
 def db_get_single_comment(post_id: str, comment_id: str) -> dict:
     logger.info(
-        f"[CRUD] Getting single comment: post_id={post_id}, comment_id={comment_id}"
+        "[CRUD] Getting single comment: post_id=%s, comment_id=%s", post_id, comment_id
     )
 
     try:
@@ -180,7 +255,9 @@ def db_get_single_comment(post_id: str, comment_id: str) -> dict:
 
         if not item:
             logger.info(
-                f"[CRUD] Comment not found: post_id={post_id}, comment_id={comment_id}"
+                "[CRUD] Comment not found: post_id=%s, comment_id=%s",
+                post_id,
+                comment_id,
             )
             raise CommentNotFoundError(
                 message=f"コメントID '{comment_id}' が存在しません。"
@@ -196,7 +273,9 @@ def db_get_single_comment(post_id: str, comment_id: str) -> dict:
             }
 
             logger.info(
-                f"[CRUD] Single comment retrieved successfully: post_id={post_id}, comment_id={comment_id}"
+                "[CRUD] Single comment retrieved successfully: post_id=%s, comment_id=%s",
+                post_id,
+                comment_id,
             )
             return comment
 
@@ -248,40 +327,81 @@ def db_get_single_comment(post_id: str, comment_id: str) -> dict:
 
 
 # JWTとCSRFの認証必要
-def db_delete_comment(post_id: str, comment_id: str) -> bool:
-    logger.info(f"[CRUD] Deleting comment: post_id={post_id}, comment_id={comment_id}")
+def db_delete_comment(post_id: str, comment_id: str, username: str) -> bool:
+    logger.info(
+        "[CRUD] Deleting comment: post_id=%s, comment_id=%s, username=%s",
+        post_id,
+        comment_id,
+        username,
+    )
 
     try:
-        response = table.delete_item(
-            Key={"PK": f"POST#{post_id}", "SK": f"COMMENT#{comment_id}"},
-            ReturnValues="ALL_OLD",  # 削除前のアイテムを返す（存在確認にも使える）
+        # コメントの削除と投稿METAのコメント数減算を同一トランザクションで実行
+        table.meta.client.transact_write_items(
+            TransactItems=[
+                {
+                    "Delete": {
+                        "TableName": table.table_name,
+                        "Key": {"PK": f"POST#{post_id}", "SK": f"COMMENT#{comment_id}"},
+                        # 存在しないコメント・他人のコメントは削除しない
+                        "ConditionExpression": "attribute_exists(SK) AND user_id = :me",
+                        "ExpressionAttributeValues": {":me": f"USER#{username}"},
+                        # 所有者違いと未存在を区別するため旧値を受け取る
+                        "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+                    }
+                },
+                _comment_counter_update(post_id, -1),
+            ]
         )
 
-        deleted_item = response.get("Attributes")
-
-        if deleted_item:
-            logger.info(
-                f"[CRUD] Comment deleted successfully: post_id={post_id}, comment_id={comment_id}"
-            )
-            return True
+        # キャッシュ済みの1ページ目のコメント数を古いままにしない
+        invalidate_feed_cache(post_id)
 
         logger.info(
-            f"[CRUD] Comment not found for deletion: post_id={post_id}, comment_id={comment_id}"
-        )
-        raise CommentNotFoundError(
-            message=f"削除対象のコメントID '{comment_id}' が存在しません。"
+            "[CRUD] Comment deleted successfully: post_id=%s, comment_id=%s",
+            post_id,
+            comment_id,
         )
-
-    except CommentNotFoundError:
-        # CommentNotFoundErrorは再スロー
-        raise
+        return True
 
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
 
+        if error_code == "TransactionCanceledException":
+            reasons = _cancellation_reasons(e)
+            comment_reason = (e.response.get("CancellationReasons") or [{}])[0]
+            if "Item" in comment_reason:
+                logger.warning(
+                    f"[CRUD] Unauthorized comment deletion attempt: post_id={post_id}, comment_id={comment_id}, username={username}"
+                )
+                raise CommentOwnershipError(
+                    message="このコメントを削除する権限がありません。",
+                    original_error=e,
+                )
+            if len(reasons) > 0 and reasons[0] == "ConditionalCheckFailed":
+                logger.info(
+                    "[CRUD] Comment not found for deletion: post_id=%s, comment_id=%s",
+                    post_id,
+                    comment_id,
+                )
+                raise CommentNotFoundError(
+                    message=f"削除対象のコメントID '{comment_id}' が存在しません。",
+                    original_error=e,
+                )
+            if len(reasons) > 1 and reasons[1] == "ConditionalCheckFailed":
+                logger.info(
+                    "[CRUD] Comment target post not found: post_id=%s, comment_id=%s",
+                    post_id,
+                    comment_id,
+                )
+                raise PostNotFoundError(
+                    message=f"投稿ID '{post_id}' が存在しません。",
+                    original_error=e,
+                )
+
         logger.error(
-            f"[CRUD] DynamoDB delete_item error for comment: post_id={post_id}, comment_id={comment_id}, error_code={error_code}, message={error_message}",
+            f"[CRUD] DynamoDB transact_write_items error for comment: post_id={post_id}, comment_id={comment_id}, error_code={error_code}, message={error_message}",
             exc_info=True,
         )
 
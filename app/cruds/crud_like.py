@@ -1,8 +1,10 @@
-from app.database import table
-from boto3.dynamodb.conditions import Key
+from app.database import table, dynamodb_client, TABLE_NAME
+from app.cruds.item_codec import decode_item, decode_value
+from app.cruds.crud_post import invalidate_feed_cache
 from typing import Union
 from datetime import datetime, timezone
 import logging
+import time
 from botocore.exceptions import ClientError
 from app.exceptions import (
     LikeRetrievalError,
@@ -10,14 +12,27 @@ from app.exceptions import (
     LikeCreationError,
     LikeDeletionError,
     LikeNotFoundError,
+    PostNotFoundError,
     DatabaseError,
 )
 
 logger = logging.getLogger(__name__)
 
+# BatchGetItemの上限キー数と、UnprocessedKeysの再試行設定
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_RETRIES = 5
+BATCH_GET_BASE_DELAY_SECONDS = 0.05
+
+# いいね切り替えが同じユーザーの連打やトランザクションの衝突で
+# キャンセルされた場合の最大試行回数と待ち時間
+LIKE_TOGGLE_MAX_ATTEMPTS = 5
+LIKE_TOGGLE_BASE_DELAY_SECONDS = 0.02
+
 
 def db_get_like(post_id: str, username: str) -> dict:
-    logger.debug(f"[CRUD] Getting like status: post_id={post_id}, username={username}")
+    logger.debug(
+        "[CRUD] Getting like status: post_id=%s, username=%s", post_id, username
+    )
 
     try:
         response = table.get_item(
@@ -27,7 +42,7 @@ def db_get_like(post_id: str, username: str) -> dict:
 
         if not item:
             logger.info(
-                f"[CRUD] Like not found: post_id={post_id}, username={username}"
+                "[CRUD] Like not found: post_id=%s, username=%s", post_id, username
             )
             raise LikeNotFoundError(
                 message=f"投稿ID '{post_id}' へのいいねが存在しません。"
@@ -40,7 +55,7 @@ def db_get_like(post_id: str, username: str) -> dict:
                 "created_at": item["created_at"],
             }
 
-            logger.info(f"[CRUD] Like found: post_id={post_id}, username={username}")
+            logger.info("[CRUD] Like found: post_id=%s, username=%s", post_id, username)
             return like_data
 
         except KeyError as e:
@@ -87,7 +102,9 @@ def db_get_like(post_id: str, username: str) -> dict:
 
 
 def db_get_like_status(post_id: str, username: str) -> bool:
-    logger.debug(f"[CRUD] Getting like status: post_id={post_id}, username={username}")
+    logger.debug(
+        "[CRUD] Getting like status: post_id=%s, username=%s", post_id, username
+    )
 
     try:
         response = table.get_item(
@@ -96,7 +113,10 @@ def db_get_like_status(post_id: str, username: str) -> bool:
         has_like = "Item" in response
 
         logger.debug(
-            f"[CRUD] Like status retrieved successfully: post_id={post_id}, username={username}, liked={has_like}"
+            "[CRUD] Like status retrieved successfully: post_id=%s, username=%s, liked=%s",
+            post_id,
+            username,
+            has_like,
         )
         return has_like
 
@@ -136,8 +156,104 @@ def db_get_like_status(post_id: str, username: str) -> bool:
         )
 
 
+def db_get_like_statuses(post_ids: list[str], username: str) -> dict[str, bool]:
+    logger.debug(
+        "[CRUD] Getting like statuses: count=%s, username=%s", len(post_ids), username
+    )
+
+    # BatchGetItemは重複キーを受け付けないため、順序を保ったまま重複を除く
+    unique_post_ids = list(dict.fromkeys(post_ids))
+    statuses = {post_id: False for post_id in unique_post_ids}
+
+    try:
+        # BatchGetItemは1リクエスト最大100キー
+        for start in range(0, len(unique_post_ids), BATCH_GET_MAX_KEYS):
+            chunk = unique_post_ids[start : start + BATCH_GET_MAX_KEYS]
+            # 一覧表示ごとに呼ばれるので、型変換のない低レベルclientで取得する
+            request_items = {
+                TABLE_NAME: {
+                    "Keys": [
+                        {
+                            "PK": {"S": f"POST#{post_id}"},
+                            "SK": {"S": f"LIKE#{username}"},
+                        }
+                        for post_id in chunk
+                    ],
+                    "ProjectionExpression": "PK",
+                }
+            }
+
+            attempt = 0
+            while request_items:
+                response = dynamodb_client.batch_get_item(RequestItems=request_items)
+                for item in response.get("Responses", {}).get(TABLE_NAME, []):
+                    statuses[item["PK"]["S"].replace("POST#", "")] = True
+
+                # スロットリング等で未処理のキーは指数バックオフで再試行
+                request_items = response.get("UnprocessedKeys") or {}
+                if request_items:
+                    attempt += 1
+                    if attempt > BATCH_GET_MAX_RETRIES:
+                        raise LikeRetrievalError(
+                            message="いいね状態の一括取得が完了しませんでした。しばらく待ってから再試行してください。"
+                        )
+                    logger.debug(
+                        "[CRUD] Retrying unprocessed like status keys: attempt=%s",
+                        attempt,
+                    )
+                    time.sleep(BATCH_GET_BASE_DELAY_SECONDS * (2 ** (attempt - 1)))
+
+        logger.debug(
+            "[CRUD] Like statuses retrieved successfully: count=%s, username=%s",
+            len(statuses),
+            username,
+        )
+        return statuses
+
+    except LikeRetrievalError:
+        logger.warning(
+            f"[CRUD] Unprocessed keys remained for like statuses: username={username}"
+        )
+        raise
+
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+
+        logger.error(
+            f"[CRUD] DynamoDB batch_get_item error for like statuses: username={username}, error_code={error_code}, message={error_message}",
+            exc_info=True,
+        )
+
+        if error_code in [
+            "ThrottlingException",
+            "ResourceNotFoundException",
+            "InternalServerError",
+        ]:
+            raise DatabaseError(
+                message="データベースサービスで問題が発生しました。しばらく待ってから再試行してください。",
+                original_error=e,
+            )
+        else:
+            raise LikeRetrievalError(
+                message="いいね状態の一括取得に失敗しました。",
+                original_error=e,
+            )
+
+    except Exception as e:
+        logger.error(
+            f"[CRUD] Unexpected error in db_get_like_statuses: username={username}, error_type={type(e).__name__}, error_message={str(e)}",
+            exc_info=True,
+        )
+
+        raise LikeRetrievalError(
+            message="いいね状態の一括取得で予期しないエラーが発生しました。",
+            original_error=e,
+        )
+
+
 def db_add_like(post_id: str, username: str) -> bool:
-    logger.info(f"[CRUD] Adding like: post_id={post_id}, username={username}")
+    logger.info("[CRUD] Adding like: post_id=%s, username=%s", post_id, username)
 
     try:
         now = datetime.now(timezone.utc).isoformat()
@@ -153,14 +269,34 @@ def db_add_like(post_id: str, username: str) -> bool:
             "GSI5_SK": f"{now}#{post_id}",  # いいねした日時 + 投稿ID
         }
 
-        # 条件式で重複した書き込みを防ぐ
-        table.put_item(
-            Item=item,
-            ConditionExpression="attribute_not_exists(PK) AND attribute_not_exists(SK)",
+        # いいねの追加と投稿METAのいいね数加算を同一トランザクションで実行
+        table.meta.client.transact_write_items(
+            TransactItems=[
+                {
+                    "Put": {
+                        "TableName": table.table_name,
+                        "Item": item,
+                        # 条件式で重複した書き込みを防ぐ
+                        "ConditionExpression": "attribute_not_exists(PK) AND attribute_not_exists(SK)",
+                    }
+                },
+                {
+                    "Update": {
+                        "TableName": table.table_name,
+                        "Key": {"PK": f"POST#{post_id}", "SK": "META"},
+                        "UpdateExpression": "ADD like_count :inc",
+                        "ConditionExpression": "attribute_exists(PK)",
+                        "ExpressionAttributeValues": {":inc": 1},
+                    }
+                },
+            ]
         )
 
+        # キャッシュ済みの1ページ目のいいね数を古いままにしない
+        invalidate_feed_cache(post_id)
+
         logger.info(
-            f"[CRUD] Like added successfully: post_id={post_id}, username={username}"
+            "[CRUD] Like added successfully: post_id=%s, username=%s", post_id, username
         )
         return True
 
@@ -168,17 +304,33 @@ def db_add_like(post_id: str, username: str) -> bool:
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
 
-        if error_code == "ConditionalCheckFailedException":
-            logger.warning(
-                f"[CRUD] Like already exists: post_id={post_id}, username={username}"
-            )
-            raise LikeAlreadyExistsError(
-                message="既にいいねされています。",
-                original_error=e,
-            )
+        if error_code == "TransactionCanceledException":
+            # CancellationReasonsはTransactItemsと同じ順序で返る
+            reasons = [
+                reason.get("Code")
+                for reason in e.response.get("CancellationReasons", [])
+            ]
+            if len(reasons) > 0 and reasons[0] == "ConditionalCheckFailed":
+                logger.warning(
+                    f"[CRUD] Like already exists: post_id={post_id}, username={username}"
+                )
+                raise LikeAlreadyExistsError(
+                    message="既にいいねされています。",
+                    original_error=e,
+                )
+            if len(reasons) > 1 and reasons[1] == "ConditionalCheckFailed":
+                logger.info(
+                    "[CRUD] Like target post not found: post_id=%s, username=%s",
+                    post_id,
+                    username,
+                )
+                raise PostNotFoundError(
+                    message=f"投稿ID '{post_id}' が存在しません。",
+                    original_error=e,
+                )
 
         logger.error(
-            f"[CRUD] DynamoDB put_item error for like: post_id={post_id}, username={username}, error_code={error_code}, message={error_message}",
+            f"[CRUD] DynamoDB transact_write_items error for like: post_id={post_id}, username={username}, error_code={error_code}, message={error_message}",
             exc_info=True,
         )
 
@@ -210,37 +362,73 @@ def db_add_like(post_id: str, username: str) -> bool:
 
 
 def db_remove_like(post_id: str, username: str) -> bool:
-    logger.info(f"[CRUD] Removing like: post_id={post_id}, username={username}")
+    logger.info("[CRUD] Removing like: post_id=%s, username=%s", post_id, username)
     try:
-        response = table.delete_item(
-            Key={"PK": f"POST#{post_id}", "SK": f"LIKE#{username}"},
-            ReturnValues="ALL_OLD",
+        # いいねの削除と投稿METAのいいね数減算を同一トランザクションで実行
+        table.meta.client.transact_write_items(
+            TransactItems=[
+                {
+                    "Delete": {
+                        "TableName": table.table_name,
+                        "Key": {"PK": f"POST#{post_id}", "SK": f"LIKE#{username}"},
+                        # 存在しないいいねの削除でいいね数を減らさない
+                        "ConditionExpression": "attribute_exists(SK)",
+                    }
+                },
+                {
+                    "Update": {
+                        "TableName": table.table_name,
+                        "Key": {"PK": f"POST#{post_id}", "SK": "META"},
+                        "UpdateExpression": "ADD like_count :dec",
+                        "ConditionExpression": "attribute_exists(PK)",
+                        "ExpressionAttributeValues": {":dec": -1},
+                    }
+                },
+            ]
         )
-        deleted_item = response.get("Attributes")
 
-        if deleted_item:
-            logger.info(
-                f"[CRUD] Like removed successfully: post_id={post_id}, username={username}"
-            )
-            return True
+        # キャッシュ済みの1ページ目のいいね数を古いままにしない
+        invalidate_feed_cache(post_id)
 
         logger.info(
-            f"[CRUD] Like not found for removal: post_id={post_id}, username={username}"
+            "[CRUD] Like removed successfully: post_id=%s, username=%s",
+            post_id,
+            username,
         )
-        raise LikeNotFoundError(
-            message=f"削除対象のいいねが存在しません。投稿ID: {post_id}"
-        )
-
-    except LikeNotFoundError:
-        # LikeNotFoundErrorは再スロー
-        raise
+        return True
 
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
 
+        if error_code == "TransactionCanceledException":
+            reasons = [
+                reason.get("Code")
+                for reason in e.response.get("CancellationReasons", [])
+            ]
+            if len(reasons) > 0 and reasons[0] == "ConditionalCheckFailed":
+                logger.info(
+                    "[CRUD] Like not found for removal: post_id=%s, username=%s",
+                    post_id,
+                    username,
+                )
+                raise LikeNotFoundError(
+                    message=f"削除対象のいいねが存在しません。投稿ID: {post_id}",
+                    original_error=e,
+                )
+            if len(reasons) > 1 and reasons[1] == "ConditionalCheckFailed":
+                logger.info(
+                    "[CRUD] Like target post not found: post_id=%s, username=%s",
+                    post_id,
+                    username,
+                )
+                raise PostNotFoundError(
+                    message=f"投稿ID '{post_id}' が存在しません。",
+                    original_error=e,
+                )
+
         logger.error(
-            f"[CRUD] DynamoDB delete_item error for like: post_id={post_id}, username={username}, error_code={error_code}, message={error_message}",
+            f"[CRUD] DynamoDB transact_write_items error for like removal: post_id={post_id}, username={username}, error_code={error_code}, message={error_message}",
             exc_info=True,
         )
 
@@ -271,19 +459,211 @@ def db_remove_like(post_id: str, username: str) -> bool:
         )
 
 
+def _like_toggle_items(post_id: str, username: str, liked: bool) -> list[dict]:
+    """現在のいいね有無を前提に、反対の状態へ書き換えるトランザクション要素
+
+    条件はユーザーごとのいいねアイテムの有無だけにし、いいね数はADDで増減する。
+    ADDは可換なので、別のユーザーが同時にいいねしても互いの条件を崩さない。
+    """
+    like_key = {"PK": f"POST#{post_id}", "SK": f"LIKE#{username}"}
+
+    if liked:
+        like_item = {
+            "Delete": {
+                "TableName": table.table_name,
+                "Key": like_key,
+                "ConditionExpression": "attribute_exists(SK)",
+            }
+        }
+    else:
+        now = datetime.now(timezone.utc).isoformat()
+        like_item = {
+            "Put": {
+                "TableName": table.table_name,
+                "Item": {
+                    **like_key,
+                    "post_id": post_id,
+                    "user_id": f"USER#{username}",
+                    "created_at": now,
+                    "GSI5_PK": f"USER#{username}",
+                    "GSI5_SK": f"{now}#{post_id}",
+                },
+                "ConditionExpression": "attribute_not_exists(SK)",
+            }
+        }
+
+    meta_item = {
+        "Update": {
+            "TableName": table.table_name,
+            "Key": {"PK": f"POST#{post_id}", "SK": "META"},
+            "UpdateExpression": "ADD like_count :delta",
+            # 条件は投稿の存在確認のみ
+            "ConditionExpression": "attribute_exists(PK)",
+            "ExpressionAttributeValues": {":delta": -1 if liked else 1},
+        }
+    }
+    return [like_item, meta_item]
+
+
+def db_toggle_like(post_id: str, username: str) -> tuple[bool, int]:
+    """いいねを切り替え、(切り替え後のいいね状態, いいね数)を返す
+
+    TransactGetItemsでいいね有無といいね数を同時に読み、いいね有無だけを条件にした
+    TransactWriteItemsで書き換えるので、通常は2往復で完了する。
+    返すいいね数は読み取った値に増減を反映したもの（同時に押した他ユーザーの分は
+    次の読み取りで反映される）。バックフィル前の投稿で負にならないよう0で下限を取る。
+    """
+    logger.info("[CRUD] Toggling like: post_id=%s, username=%s", post_id, username)
+
+    try:
+        response = dynamodb_client.transact_get_items(
+            TransactItems=[
+                {
+                    "Get": {
+                        "TableName": TABLE_NAME,
+                        "Key": {
+                            "PK": {"S": f"POST#{post_id}"},
+                            "SK": {"S": f"LIKE#{username}"},
+                        },
+                        "ProjectionExpression": "PK",
+                    }
+                },
+                {
+                    "Get": {
+                        "TableName": TABLE_NAME,
+                        "Key": {"PK": {"S": f"POST#{post_id}"}, "SK": {"S": "META"}},
+                        "ProjectionExpression": "PK, like_count",
+                    }
+                },
+            ]
+        )
+        like_response, meta_response = response["Responses"]
+
+        meta = meta_response.get("Item")
+        if not meta:
+            logger.info("[CRUD] Like target post not found: post_id=%s", post_id)
+            raise PostNotFoundError(message=f"投稿ID '{post_id}' が存在しません。")
+
+        liked = "Item" in like_response
+        like_count = decode_value(meta["like_count"]) if "like_count" in meta else 0
+
+        for attempt in range(1, LIKE_TOGGLE_MAX_ATTEMPTS + 1):
+            try:
+                table.meta.client.transact_write_items(
+                    TransactItems=_like_toggle_items(post_id, username, liked)
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "TransactionCanceledException":
+                    raise
+
+                reasons = e.response.get("CancellationReasons", [])
+                like_code = reasons[0].get("Code") if len(reasons) > 0 else None
+                meta_code = reasons[1].get("Code") if len(reasons) > 1 else None
+
+                if meta_code == "ConditionalCheckFailed":
+                    # 読み取り後に投稿が削除された
+                    logger.info(
+                        "[CRUD] Like target post not found: post_id=%s", post_id
+                    )
+                    raise PostNotFoundError(
+                        message=f"投稿ID '{post_id}' が存在しません。",
+                        original_error=e,
+                    )
+                if like_code == "ConditionalCheckFailed":
+                    # 同じユーザーの別リクエストが先に切り替えた。その状態から切り替え直す
+                    liked = not liked
+                    like_count += 1 if liked else -1
+                else:
+                    # TransactionConflictなど（同じアイテムへの同時トランザクション）
+                    time.sleep(LIKE_TOGGLE_BASE_DELAY_SECONDS * (2 ** (attempt - 1)))
+
+                logger.debug(
+                    "[CRUD] Like toggle cancelled, retrying: post_id=%s, username=%s, attempt=%s, reasons=%s",
+                    post_id,
+                    username,
+                    attempt,
+                    [like_code, meta_code],
+                )
+                continue
+
+            is_liked = not liked
+            new_count = max(like_count + (1 if is_liked else -1), 0)
+
+            # キャッシュ済みの1ページ目のいいね数を古いままにしない
+            invalidate_feed_cache(post_id)
+
+            logger.info(
+                "[CRUD] Like toggled successfully: post_id=%s, username=%s, is_liked=%s, like_count=%s",
+                post_id,
+                username,
+                is_liked,
+                new_count,
+            )
+            return is_liked, new_count
+
+        logger.warning(
+            f"[CRUD] Like toggle gave up after conflicts: post_id={post_id}, username={username}"
+        )
+        raise DatabaseError(
+            message="いいねの操作が混み合っています。しばらく待ってから再試行してください。"
+        )
+
+    except (PostNotFoundError, DatabaseError):
+        raise
+
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+
+        logger.error(
+            f"[CRUD] DynamoDB transaction error for like toggle: post_id={post_id}, username={username}, error_code={error_code}, message={error_message}",
+            exc_info=True,
+        )
+
+        if error_code in [
+            "ThrottlingException",
+            "ResourceNotFoundException",
+            "InternalServerError",
+        ]:
+            raise DatabaseError(
+                message="データベースサービスで問題が発生しました。しばらく待ってから再試行してください。",
+                original_error=e,
+            )
+        else:
+            raise LikeCreationError(
+                message="いいねの切り替えに失敗しました。",
+                original_error=e,
+            )
+
+    except Exception as e:
+        logger.error(
+            f"[CRUD] Unexpected error in db_toggle_like: post_id={post_id}, username={username}, error_type={type(e).__name__}, error_message={str(e)}",
+            exc_info=True,
+        )
+
+        raise LikeCreationError(
+            message="いいね切り替えで予期しないエラーが発生しました。",
+            original_error=e,
+        )
+
+
 def db_get_like_count(post_id: str) -> int:
-    logger.debug(f"[CRUD] Getting like count for post: post_id={post_id}")
+    logger.debug("[CRUD] Getting like count for post: post_id=%s", post_id)
     try:
-        response = table.query(
-            KeyConditionExpression=Key("PK").eq(f"POST#{post_id}")
-            & Key("SK").begins_with("LIKE#"),
-            Select="COUNT",  # カウントのみ取得
+        # 投稿METAに非正規化したいいね数を読む（いいねアイテムは走査しない）
+        response = dynamodb_client.get_item(
+            TableName=TABLE_NAME,
+            Key={"PK": {"S": f"POST#{post_id}"}, "SK": {"S": "META"}},
+            ProjectionExpression="like_count",
         )
 
-        like_count = response.get("Count", 0)
+        item = decode_item(response.get("Item", {}))
+        like_count = item.get("like_count", 0)
 
         logger.debug(
-            f"[CRUD] Like count retrieved successfully: post_id={post_id}, count={like_count}"
+            "[CRUD] Like count retrieved successfully: post_id=%s, count=%s",
+            post_id,
+            like_count,
         )
         return like_count
 
@@ -292,7 +672,7 @@ def db_get_like_count(post_id: str) -> int:
         error_message = e.response["Error"]["Message"]
 
         logger.error(
-            f"[CRUD] DynamoDB query error for like count: post_id={post_id}, error_code={error_code}, message={error_message}",
+            f"[CRUD] DynamoDB get_item error for like count: post_id={post_id}, error_code={error_code}, message={error_message}",
             exc_info=True,
         )
 
@@ -1,8 +1,12 @@
-from app.database import table
+from app.database import table, dynamodb_client, TABLE_NAME
+from app.cruds.item_codec import decode_item, encode_item
 from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 from typing import Union, Optional, Any
+import contextvars
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from app.config.logging_config import LoggingConfig
 from app.exceptions import (
@@ -11,34 +15,60 @@ from app.exceptions import (
     PostCreationError,
     PostUpdateError,
     PostDeletionError,
+    PostOwnershipError,
     DatabaseError,
 )
 import logging
+from app.cache import TTLCache
+from decouple import config
 
 logger = logging.getLogger(__name__)
 
+# 1ページ目（全体・カテゴリ別）を(limit, category)単位で短時間共有するキャッシュ
+# いいね状態はユーザーごとにService層でキャッシュの上から付与する
+FEED_CACHE_TTL_SECONDS = config("FEED_CACHE_TTL_SECONDS", default=10, cast=int)
+feed_cache = TTLCache("feed_first_page", maxsize=64, ttl=FEED_CACHE_TTL_SECONDS)
+
+
+def invalidate_feed_cache(post_id: Optional[str] = None) -> None:
+    """post_id指定時はその投稿を含むページのみ、省略時はすべて破棄する"""
+    if post_id is None:
+        feed_cache.invalidate()
+        return
+
+    feed_cache.invalidate_matching(
+        lambda key, page: any(post["post_id"] == post_id for post in page["posts"])
+    )
+
 
 # 降順＝新しい順にソート
 def db_get_posts(limit: int = 10, last_evaluated_key: dict = None) -> list[dict]:
     logger.info(
-        f"[CRUD] Getting posts: limit={limit}, has_last_key={last_evaluated_key is not None}"
+        "[CRUD] Getting posts: limit=%s, has_last_key=%s",
+        limit,
+        last_evaluated_key is not None,
     )
 
     try:
         query_params = {
+            "TableName": TABLE_NAME,
             "IndexName": "GSI_PostList",
-            "KeyConditionExpression": Key("GSI1_PK").eq("POST#ALL"),
+            "KeyConditionExpression": "GSI1_PK = :pk",
+            "ExpressionAttributeValues": {":pk": {"S": "POST#ALL"}},
             "Limit": limit,
             "ScanIndexForward": False,
         }
 
         if last_evaluated_key:
-            query_params["ExclusiveStartKey"] = last_evaluated_key
+            query_params["ExclusiveStartKey"] = encode_item(last_evaluated_key)
 
-        response = table.query(**query_params)
+        # 一覧は件数が多いので、低レベルclientと軽量な変換で取得する
+        response = dynamodb_client.query(**query_params)
 
-        items = response.get("Items", [])
+        items = [decode_item(item) for item in response.get("Items", [])]
         last_key = response.get("LastEvaluatedKey")
+        if last_key:
+            last_key = decode_item(last_key)
 
         # 投稿データの変換
         posts = []
@@ -55,6 +85,8 @@ def db_get_posts(limit: int = 10, last_evaluated_key: dict = None) -> list[dict]
                     "recommend3": item["recommend3"],
                     "created_at": item["created_at"],
                     "updated_at": item["updated_at"],
+                    "like_count": int(item.get("like_count", 0)),
+                    "comment_count": int(item.get("comment_count", 0)),
                 }
                 posts.append(post)
             except KeyError as e:
@@ -65,7 +97,9 @@ def db_get_posts(limit: int = 10, last_evaluated_key: dict = None) -> list[dict]
                 continue
 
         logger.info(
-            f"[CRUD] Posts retrieved successfully: count={len(posts)}, has_more={last_key is not None}"
+            "[CRUD] Posts retrieved successfully: count=%s, has_more=%s",
+            len(posts),
+            last_key is not None,
         )
 
         result = {
@@ -116,23 +150,32 @@ def db_get_posts_by_category(
     category: str, limit: int = 10, last_evaluated_key: Optional[dict] = None
 ) -> dict:
     logger.info(
-        f"[CRUD] Getting posts by category: category={category}, limit={limit}, has_last_key={last_evaluated_key is not None}"
+        "[CRUD] Getting posts by category: category=%s, limit=%s, has_last_key=%s",
+        category,
+        limit,
+        last_evaluated_key is not None,
     )
 
     try:
         query_params = {
+            "TableName": TABLE_NAME,
             "IndexName": "GSI_Category",
-            "KeyConditionExpression": Key("GSI2_PK").eq(f"CATEGORY#{category}"),
+            "KeyConditionExpression": "GSI2_PK = :pk",
+            "ExpressionAttributeValues": {":pk": {"S": f"CATEGORY#{category}"}},
             "Limit": limit,
             "ScanIndexForward": False,
         }
 
         if last_evaluated_key:
-            query_params["ExclusiveStartKey"] = last_evaluated_key
+            query_params["ExclusiveStartKey"] = encode_item(last_evaluated_key)
 
-        response = table.query(**query_params)
-        items = response.get("Items", [])
+        # 一覧は件数が多いので、低レベルclientと軽量な変換で取得する
+        response = dynamodb_client.query(**query_params)
+
+        items = [decode_item(item) for item in response.get("Items", [])]
         last_key = response.get("LastEvaluatedKey")
+        if last_key:
+            last_key = decode_item(last_key)
 
         posts = []
         for item in items:
@@ -148,6 +191,8 @@ def db_get_posts_by_category(
                     "recommend3": item["recommend3"],
                     "created_at": item["created_at"],
                     "updated_at": item["updated_at"],
+                    "like_count": int(item.get("like_count", 0)),
+                    "comment_count": int(item.get("comment_count", 0)),
                 }
                 posts.append(post)
             except KeyError as e:
@@ -158,7 +203,10 @@ def db_get_posts_by_category(
                 continue
 
         logger.info(
-            f"[CRUD] Posts by category retrieved successfully: category={category}, count={len(posts)}, has_more={last_key is not None}"
+            "[CRUD] Posts by category retrieved successfully: category=%s, count=%s, has_more=%s",
+            category,
+            len(posts),
+            last_key is not None,
         )
 
         result = {
@@ -199,16 +247,20 @@ def db_get_posts_by_category(
 
 
 def db_get_single_post(post_id: str) -> dict:
-    logger.info(f"[CRUD] Getting single post: post_id={post_id}")
+    logger.info("[CRUD] Getting single post: post_id=%s", post_id)
 
     try:
-        response = table.get_item(Key={"PK": f"POST#{post_id}", "SK": "META"})
+        response = dynamodb_client.get_item(
+            TableName=TABLE_NAME,
+            Key={"PK": {"S": f"POST#{post_id}"}, "SK": {"S": "META"}},
+        )
         item = response.get("Item")  # 該当データがなければ None
 
         if not item:
-            logger.info(f"[CRUD] Post not found: post_id={post_id}")
+            logger.info("[CRUD] Post not found: post_id=%s", post_id)
             raise PostNotFoundError(message=f"投稿ID '{post_id}' が存在しません。")
 
+        item = decode_item(item)
         try:
             post = {
                 "post_id": item["PK"].replace("POST#", ""),
@@ -221,9 +273,13 @@ def db_get_single_post(post_id: str) -> dict:
                 "recommend3": item["recommend3"],
                 "created_at": datetime.fromisoformat(item["created_at"]),
                 "updated_at": datetime.fromisoformat(item["updated_at"]),
+                "like_count": int(item.get("like_count", 0)),
+                "comment_count": int(item.get("comment_count", 0)),
             }
 
-            logger.info(f"[CRUD] Single post retrieved successfully: post_id={post_id}")
+            logger.info(
+                "[CRUD] Single post retrieved successfully: post_id=%s", post_id
+            )
             return post
 
         except KeyError as e:
@@ -269,9 +325,80 @@ def db_get_single_post(post_id: str) -> dict:
         )
 
 
+def db_get_post_version(post_id: str) -> dict:
+    logger.debug("[CRUD] Getting post version: post_id=%s", post_id)
+
+    try:
+        # ETag判定用に、レスポンス内容を決める属性だけを低レベルclientで読む
+        response = dynamodb_client.get_item(
+            TableName=TABLE_NAME,
+            Key={"PK": {"S": f"POST#{post_id}"}, "SK": {"S": "META"}},
+            ProjectionExpression="updated_at, like_count, comment_count",
+        )
+        item = response.get("Item")
+
+        if not item:
+            logger.info("[CRUD] Post not found: post_id=%s", post_id)
+            raise PostNotFoundError(message=f"投稿ID '{post_id}' が存在しません。")
+
+        item = decode_item(item)
+        try:
+            # db_get_single_postと同じ型にそろえ、同じETagになるようにする
+            return {
+                "updated_at": datetime.fromisoformat(item["updated_at"]),
+                "like_count": int(item.get("like_count", 0)),
+                "comment_count": int(item.get("comment_count", 0)),
+            }
+
+        except KeyError as e:
+            logger.warning(f"[CRUD] Invalid post data - missing field: {str(e)}")
+            raise PostRetrievalError(
+                message="投稿データが不正です。管理者にお問い合わせください。",
+                original_error=e,
+            )
+
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+
+        logger.error(
+            f"[CRUD] DynamoDB get_item error for post version: post_id={post_id}, error_code={error_code}, message={error_message}",
+            exc_info=True,
+        )
+
+        if error_code in [
+            "ThrottlingException",
+            "ResourceNotFoundException",
+            "InternalServerError",
+        ]:
+            raise DatabaseError(
+                message="データベースサービスで問題が発生しました。しばらく待ってから再試行してください。",
+                original_error=e,
+            )
+        else:
+            raise PostRetrievalError(
+                message="投稿の取得に失敗しました。",
+                original_error=e,
+            )
+
+    except (PostNotFoundError, PostRetrievalError):
+        raise
+
+    except Exception as e:
+        logger.error(
+            f"[CRUD] Unexpected error in db_get_post_version: post_id={post_id}, error_type={type(e).__name__}, error_message={str(e)}",
+            exc_info=True,
+        )
+
+        raise PostRetrievalError(
+            message="投稿取得で予期しないエラーが発生しました。",
+            original_error=e,
+        )
+
+
 # usernameはログイン中のユーザー名
 def db_create_post(username: str, data: dict) -> dict:
-    logger.info(f"[CRUD] Starting post creation for user: {username}")
+    logger.info("[CRUD] Starting post creation for user: %s", username)
 
     try:
         post_id = str(uuid.uuid4())
@@ -290,6 +417,8 @@ def db_create_post(username: str, data: dict) -> dict:
             "recommend3": data.recommend3,
             "created_at": now,
             "updated_at": now,
+            "like_count": 0,  # いいね数はcrud_likeのトランザクションで増減
+            "comment_count": 0,  # コメント数はcrud_commentのトランザクションで増減
             # GSI1: 全投稿一覧
             "GSI1_PK": "POST#ALL",
             "GSI1_SK": f"{now}#{post_id}",
@@ -305,8 +434,14 @@ def db_create_post(username: str, data: dict) -> dict:
             Item=item
         )  # 200以外は例外botocore.exceptions.ClientErrorをスロー
 
+        # 新しい投稿は全体・カテゴリ別の先頭に入るので1ページ目を破棄
+        invalidate_feed_cache()
+
         logger.info(
-            f"[CRUD] Post created successfully: post_id={post_id}, username={username}, category={data.category}"
+            "[CRUD] Post created successfully: post_id=%s, username=%s, category=%s",
+            post_id,
+            username,
+            data.category,
         )
 
         return {
@@ -320,6 +455,8 @@ def db_create_post(username: str, data: dict) -> dict:
             "recommend3": data.recommend3,
             "created_at": now,
             "updated_at": now,
+            "like_count": 0,
+            "comment_count": 0,
         }
 
     except ClientError as e:
@@ -354,68 +491,89 @@ def db_create_post(username: str, data: dict) -> dict:
         )
 
 
-def db_update_post(post_id: str, data: dict) -> dict:
-    logger.info(f"[CRUD] Updating post: post_id={post_id}")
+def db_update_post(post_id: str, data: dict, username: str) -> dict:
+    """投稿を更新する（所有者の確認は条件式で行い、事前の読み取りはしない）"""
+    logger.info("[CRUD] Updating post: post_id=%s, username=%s", post_id, username)
 
     try:
         now = datetime.now(timezone.utc).isoformat()
 
-        existing_item = table.get_item(Key={"PK": f"POST#{post_id}", "SK": "META"}).get(
-            "Item"
-        )  # 既存データ取得
-
-        if not existing_item:
-            logger.info(f"[CRUD] Post not found for update: post_id={post_id}")
-            raise PostNotFoundError(
-                message=f"更新対象の投稿ID '{post_id}' が存在しません。"
-            )
-
-        created_at = existing_item.get("created_at", now)
-        item = {
-            "PK": f"POST#{post_id}",
-            "SK": "META",
-            "user_id": existing_item["user_id"],
-            "category": data.category,
-            "title": data.title,
-            "description": data.description,
-            "recommend1": data.recommend1,
-            "recommend2": data.recommend2,
-            "recommend3": data.recommend3,
-            "created_at": created_at,
-            "updated_at": now,
-            # GSI1: 全投稿一覧
-            "GSI1_PK": "POST#ALL",
-            "GSI1_SK": f"{now}#{post_id}",
-            # GSI2: カテゴリ別
-            "GSI2_PK": f"CATEGORY#{data.category}",
-            "GSI2_SK": f"{now}#{post_id}",
-            # GSI3: ユーザー別
-            "GSI3_PK": existing_item["user_id"],
-            "GSI3_SK": f"POST#{post_id}",
-        }
-
-        response = table.put_item(Item=item)
+        # like_count・comment_count・created_atなど更新しない属性はそのまま残る
+        response = table.update_item(
+            Key={"PK": f"POST#{post_id}", "SK": "META"},
+            UpdateExpression=(
+                "SET #category = :category, #title = :title, "
+                "#description = :description, recommend1 = :recommend1, "
+                "recommend2 = :recommend2, recommend3 = :recommend3, "
+                "updated_at = :now, GSI1_SK = :sort_key, "
+                "GSI2_PK = :category_pk, GSI2_SK = :sort_key, GSI3_SK = :sort_key"
+            ),
+            ConditionExpression="attribute_exists(PK) AND user_id = :me",
+            # 予約語と衝突しうる属性名はプレースホルダーで指定する
+            ExpressionAttributeNames={
+                "#category": "category",
+                "#title": "title",
+                "#description": "description",
+            },
+            ExpressionAttributeValues={
+                ":category": data.category,
+                ":title": data.title,
+                ":description": data.description,
+                ":recommend1": data.recommend1,
+                ":recommend2": data.recommend2,
+                ":recommend3": data.recommend3,
+                ":now": now,
+                # GSI1〜3: 更新日時 + 投稿IDで並べる
+                ":sort_key": f"{now}#{post_id}",
+                ":category_pk": f"CATEGORY#{data.category}",
+                ":me": f"USER#{username}",
+            },
+            ReturnValues="ALL_NEW",
+            # 条件に失敗したときは、存在しないのか他人の投稿なのかを区別するため旧値を受け取る
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+        )
+        item = response["Attributes"]
 
         result = {
             "post_id": post_id,
-            "username": existing_item["user_id"].replace("USER#", ""),
-            "category": data.category,
-            "title": data.title,
-            "description": data.description,
-            "recommend1": data.recommend1,
-            "recommend2": data.recommend2,
-            "recommend3": data.recommend3,
-            "created_at": created_at,
-            "updated_at": now,
+            "username": item["user_id"].replace("USER#", ""),
+            "category": item["category"],
+            "title": item["title"],
+            "description": item.get("description"),
+            "recommend1": item["recommend1"],
+            "recommend2": item["recommend2"],
+            "recommend3": item["recommend3"],
+            "created_at": item["created_at"],
+            "updated_at": item["updated_at"],
+            "like_count": int(item.get("like_count", 0)),
+            "comment_count": int(item.get("comment_count", 0)),
         }
 
-        logger.info(f"[CRUD] Post updated successfully: post_id={post_id}")
+        # 更新日時で並び順・カテゴリが変わるので1ページ目をすべて破棄
+        invalidate_feed_cache()
+
+        logger.info("[CRUD] Post updated successfully: post_id=%s", post_id)
         return result
 
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
 
+        if error_code == "ConditionalCheckFailedException":
+            if "Item" in e.response:
+                logger.warning(
+                    f"[CRUD] Unauthorized post update attempt: post_id={post_id}, username={username}"
+                )
+                raise PostOwnershipError(
+                    message="この投稿を更新する権限がありません。",
+                    original_error=e,
+                )
+            logger.info("[CRUD] Post not found for update: post_id=%s", post_id)
+            raise PostNotFoundError(
+                message=f"更新対象の投稿ID '{post_id}' が存在しません。",
+                original_error=e,
+            )
+
         logger.error(
             f"[CRUD] DynamoDB update error: post_id={post_id}, error_code={error_code}, message={error_message}",
             exc_info=True,
@@ -449,34 +607,205 @@ def db_update_post(post_id: str, data: dict) -> dict:
 
 
 # postと紐づいているcomments,likesを削除する
-# SQSへ退避処理を後ほど実装
-def db_delete_post_and_related_items(post_id: str) -> bool:
+# 投稿パーティション（META・コメント・いいね）の削除
+# リクエスト内で削除しきれない大きなパーティションは「削除待ち」に記録し、
+# 定期実行のジョブ（app/jobs.py）が続きを削除する
+DELETE_QUERY_PAGE_SIZE = 500
+BATCH_WRITE_MAX_ITEMS = 25
+DELETE_MAX_WORKERS = config("DELETE_MAX_WORKERS", default=4, cast=int)
+DELETE_SYNC_BUDGET_SECONDS = config(
+    "DELETE_SYNC_BUDGET_SECONDS", default=2.0, cast=float
+)
+# 削除待ちの投稿を1つのパーティションにまとめ、ジョブからクエリで拾えるようにする
+PENDING_DELETIONS_PK = "DELETION#PENDING"
+
+_delete_executor = ThreadPoolExecutor(
+    max_workers=DELETE_MAX_WORKERS, thread_name_prefix="cascade-delete"
+)
+
+
+def _delete_key_chunk(keys: list[dict]) -> int:
+    """キーのチャンクを削除する（未処理分の再送はbatch_writerが行う）"""
+    with table.batch_writer() as batch:
+        for key in keys:
+            batch.delete_item(Key=key)
+    return len(keys)
+
+
+def _purge_post_partition(
+    post_id: str, deadline: Optional[float] = None
+) -> tuple[int, bool]:
+    """POST#<id>パーティションをキーのみのクエリでページングしながら並列に削除する
+
+    deadlineを過ぎたらページの区切りで中断し、(削除件数, 完了したか)を返す。
+    削除済みのアイテムは次のクエリに現れないので、再開時は先頭から読み直せばよい。
+    """
+    deleted = 0
+    query_params = {
+        "KeyConditionExpression": Key("PK").eq(f"POST#{post_id}"),
+        "ProjectionExpression": "PK, SK",
+        "Limit": DELETE_QUERY_PAGE_SIZE,
+    }
+
+    while True:
+        response = table.query(**query_params)
+        keys = [
+            {"PK": item["PK"], "SK": item["SK"]} for item in response.get("Items", [])
+        ]
+
+        futures = [
+            _delete_executor.submit(
+                contextvars.copy_context().run,
+                _delete_key_chunk,
+                keys[i : i + BATCH_WRITE_MAX_ITEMS],
+            )
+            for i in range(0, len(keys), BATCH_WRITE_MAX_ITEMS)
+        ]
+        for future in futures:
+            deleted += future.result()
+
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return deleted, True
+        if deadline is not None and time.monotonic() >= deadline:
+            return deleted, False
+        query_params["ExclusiveStartKey"] = last_key
+
+
+def _deletion_pending_item(post_id: str, deleted_count: int) -> dict:
+    return {
+        "PK": PENDING_DELETIONS_PK,
+        "SK": f"POST#{post_id}",
+        "post_id": post_id,
+        "deleted_count": deleted_count,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _mark_deletion_pending(post_id: str, deleted_count: int) -> None:
+    """関連アイテムの削除が終わっていない投稿を削除待ちとして記録する"""
+    table.put_item(Item=_deletion_pending_item(post_id, deleted_count))
+
+
+def _clear_deletion_pending(post_id: str) -> None:
+    table.delete_item(Key={"PK": PENDING_DELETIONS_PK, "SK": f"POST#{post_id}"})
+
+
+def _update_deletion_progress(post_id: str, deleted_count: int) -> None:
+    # 削除待ちは記録済みなので、進捗の更新に失敗しても削除自体は成功として扱う
+    try:
+        _mark_deletion_pending(post_id, deleted_count)
+    except ClientError as e:
+        logger.warning(
+            f"[CRUD] Failed to update deletion progress: post_id={post_id}, error={str(e)}"
+        )
+
+
+def _clear_deletion_pending_quietly(post_id: str) -> None:
+    # 消し損ねても、次回のジョブが空のパーティションを確認して消す
+    try:
+        _clear_deletion_pending(post_id)
+    except ClientError as e:
+        logger.warning(
+            f"[CRUD] Failed to clear pending deletion: post_id={post_id}, error={str(e)}"
+        )
+
+
+def db_delete_post_and_related_items(post_id: str, username: str) -> bool:
+    """投稿と関連アイテムを削除する
+
+    METAの所有者の条件付き削除と削除待ちの記録を同じトランザクションで行うので、
+    投稿は一覧・詳細から即座に見えなくなり、時間切れやLambdaのタイムアウトで
+    途中終了しても残りはdb_resume_pending_post_deletionsが必ず拾える。
+    リクエスト内で削除しきれなかった場合はFalseを返す。
+    """
     logger.info(
-        f"[CRUD] Attempting to delete post and related items: post_id={post_id}"
+        "[CRUD] Attempting to delete post and related items: post_id=%s, username=%s",
+        post_id,
+        username,
     )
 
     try:
-        # 投稿・コメント・いいねをすべて取得
-        response = table.query(KeyConditionExpression=Key("PK").eq(f"POST#{post_id}"))
-        items = response.get("Items", [])
-
-        if not items:
-            logger.warning(f"[CRUD] No items found for deletion: post_id={post_id}")
-            raise PostNotFoundError(
-                message=f"削除対象の投稿ID '{post_id}' が存在しません。"
+        try:
+            table.meta.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Delete": {
+                            "TableName": table.table_name,
+                            "Key": {"PK": f"POST#{post_id}", "SK": "META"},
+                            "ConditionExpression": "attribute_exists(PK) AND user_id = :me",
+                            "ExpressionAttributeValues": {":me": f"USER#{username}"},
+                            "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+                        }
+                    },
+                    {
+                        "Put": {
+                            "TableName": table.table_name,
+                            "Item": _deletion_pending_item(post_id, 1),
+                        }
+                    },
+                ]
             )
+        except ClientError as e:
+            # CancellationReasonsはTransactItemsと同じ順序（0番目がMETAの削除）
+            reasons = e.response.get("CancellationReasons", [])
+            meta_reason = reasons[0] if reasons else {}
+            if (
+                e.response["Error"]["Code"] == "TransactionCanceledException"
+                and meta_reason.get("Code") == "ConditionalCheckFailed"
+            ):
+                if "Item" in meta_reason:
+                    logger.warning(
+                        f"[CRUD] Unauthorized post deletion attempt: post_id={post_id}, username={username}"
+                    )
+                    raise PostOwnershipError(
+                        message="この投稿を削除する権限がありません。",
+                        original_error=e,
+                    )
+                logger.warning(f"[CRUD] No items found for deletion: post_id={post_id}")
+                raise PostNotFoundError(
+                    message=f"削除対象の投稿ID '{post_id}' が存在しません。"
+                )
+            raise
 
-        # 一括削除（最大25件ずつ処理され、25件より大きい数を処理可能）
-        with table.batch_writer() as batch:
-            for item in items:
-                logger.debug(f"[CRUD] Deleting item: PK={item['PK']}, SK={item['SK']}")
-                batch.delete_item(Key={"PK": item["PK"], "SK": item["SK"]})
+        invalidate_feed_cache(post_id)
+
+        deadline = time.monotonic() + DELETE_SYNC_BUDGET_SECONDS
+        try:
+            deleted, completed = _purge_post_partition(post_id, deadline)
+        except Exception as e:
+            # 投稿自体は削除済みなので失敗にはせず、残りは削除待ちのまま再実行に任せる
+            logger.error(
+                f"[CRUD] Related items purge failed, left pending for retry: post_id={post_id}, error_type={type(e).__name__}, error_message={str(e)}",
+                exc_info=True,
+            )
+            return False
+
+        if not completed:
+            _update_deletion_progress(post_id, deleted + 1)
+            logger.warning(
+                "[CRUD] Post deletion left pending for retry: post_id=%s, deleted=%s",
+                post_id,
+                deleted + 1,
+                extra={
+                    "event_type": "post_deletion_pending",
+                    "post_id": post_id,
+                    "deleted_count": deleted + 1,
+                },
+            )
+            return False
 
+        _clear_deletion_pending_quietly(post_id)
         logger.info(
-            f"[CRUD] Post and related items deleted successfully: post_id={post_id}"
+            "[CRUD] Post and related items deleted successfully: post_id=%s, deleted=%s",
+            post_id,
+            deleted + 1,
         )
         return True
 
+    except (PostNotFoundError, PostOwnershipError):
+        raise
+
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
@@ -500,29 +829,84 @@ def db_delete_post_and_related_items(post_id: str) -> bool:
         )
 
 
+def db_resume_pending_post_deletions(budget_seconds: float) -> dict[str, int]:
+    """削除待ちの投稿の関連アイテムを削除する（定期実行のジョブ用）
+
+    budget_secondsを過ぎたら次の実行に持ち越す。1件の失敗で他の投稿を止めない。
+    """
+    deadline = time.monotonic() + budget_seconds
+    summary = {"completed": 0, "pending": 0, "failed": 0}
+
+    query_params = {"KeyConditionExpression": Key("PK").eq(PENDING_DELETIONS_PK)}
+    while True:
+        response = table.query(**query_params)
+        for item in response.get("Items", []):
+            post_id = item["post_id"]
+            if time.monotonic() >= deadline:
+                summary["pending"] += 1
+                continue
+            try:
+                deleted, completed = _purge_post_partition(post_id, deadline)
+                if completed:
+                    _clear_deletion_pending(post_id)
+                    summary["completed"] += 1
+                else:
+                    _mark_deletion_pending(
+                        post_id, int(item.get("deleted_count", 0)) + deleted
+                    )
+                    summary["pending"] += 1
+            except Exception as e:
+                logger.error(
+                    f"[CRUD] Pending post deletion failed: post_id={post_id}, error_type={type(e).__name__}, error_message={str(e)}",
+                    exc_info=True,
+                )
+                summary["failed"] += 1
+
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            break
+        query_params["ExclusiveStartKey"] = last_key
+
+    logger.info(
+        "[CRUD] Pending post deletions processed: completed=%s, pending=%s, failed=%s",
+        summary["completed"],
+        summary["pending"],
+        summary["failed"],
+    )
+    return summary
+
+
 # 降順＝新しい順にソート
 def db_get_posts_by_user_paginated(
     username: str, limit: int = 10, last_evaluated_key: dict = None
 ) -> dict[str, Any]:
     logger.info(
-        f"[CRUD] Getting posts by user: username={username}, limit={limit}, has_last_key={last_evaluated_key is not None}"
+        "[CRUD] Getting posts by user: username=%s, limit=%s, has_last_key=%s",
+        username,
+        limit,
+        last_evaluated_key is not None,
     )
 
     try:
         query_params = {
+            "TableName": TABLE_NAME,
             "IndexName": "GSI_UserPosts",
-            "KeyConditionExpression": Key("GSI3_PK").eq(f"USER#{username}"),
+            "KeyConditionExpression": "GSI3_PK = :pk",
+            "ExpressionAttributeValues": {":pk": {"S": f"USER#{username}"}},
             "Limit": limit,
             "ScanIndexForward": False,
         }
 
         if last_evaluated_key:
-            query_params["ExclusiveStartKey"] = last_evaluated_key
+            query_params["ExclusiveStartKey"] = encode_item(last_evaluated_key)
 
-        response = table.query(**query_params)
+        # 一覧は件数が多いので、低レベルclientと軽量な変換で取得する
+        response = dynamodb_client.query(**query_params)
 
-        items = response.get("Items", [])
+        items = [decode_item(item) for item in response.get("Items", [])]
         last_key = response.get("LastEvaluatedKey")
+        if last_key:
+            last_key = decode_item(last_key)
 
         # 投稿データの変換
         posts = []
@@ -539,6 +923,8 @@ def db_get_posts_by_user_paginated(
                     "recommend3": item["recommend3"],
                     "created_at": item["created_at"],
                     "updated_at": item["updated_at"],
+                    "like_count": int(item.get("like_count", 0)),
+                    "comment_count": int(item.get("comment_count", 0)),
                 }
                 posts.append(post)
             except KeyError as e:
@@ -548,7 +934,10 @@ def db_get_posts_by_user_paginated(
                 continue
 
         logger.info(
-            f"[CRUD] Posts by user retrieved successfully: username={username}, count={len(posts)}, has_more={last_key is not None}"
+            "[CRUD] Posts by user retrieved successfully: username=%s, count=%s, has_more=%s",
+            username,
+            len(posts),
+            last_key is not None,
         )
 
         result = {
@@ -598,25 +987,33 @@ def db_get_user_liked_posts_paginated(
     username: str, limit: int = 10, last_evaluated_key: Optional[dict[str, Any]] = None
 ) -> dict[str, Any]:
     logger.info(
-        f"[CRUD] Getting user liked posts: username={username}, limit={limit}, has_last_key={last_evaluated_key is not None}"
+        "[CRUD] Getting user liked posts: username=%s, limit=%s, has_last_key=%s",
+        username,
+        limit,
+        last_evaluated_key is not None,
     )
 
     try:
         query_params = {
+            "TableName": TABLE_NAME,
             "IndexName": "GSI5_UserLikes",
-            "KeyConditionExpression": Key("GSI5_PK").eq(f"USER#{username}"),
+            "KeyConditionExpression": "GSI5_PK = :pk",
+            "ExpressionAttributeValues": {":pk": {"S": f"USER#{username}"}},
             "Limit": limit,
             "ScanIndexForward": False,  # いいねした順（新しい順）
         }
 
         if last_evaluated_key:
-            query_params["ExclusiveStartKey"] = last_evaluated_key
+            query_params["ExclusiveStartKey"] = encode_item(last_evaluated_key)
 
-        response = table.query(**query_params)
-        like_items = response.get("Items", [])
+        response = dynamodb_client.query(**query_params)
+        like_items = [decode_item(item) for item in response.get("Items", [])]
+        last_key = response.get("LastEvaluatedKey")
+        if last_key:
+            last_key = decode_item(last_key)
 
         if not like_items:
-            logger.info(f"[CRUD] No liked posts found for user: username={username}")
+            logger.info("[CRUD] No liked posts found for user: username=%s", username)
             return {"posts": [], "last_evaluated_key": None, "count": 0}
 
         # 取得したpost_idsを使って、Batch処理で一括高速「投稿詳細データ」取得
@@ -625,17 +1022,19 @@ def db_get_user_liked_posts_paginated(
 
         # BatchGetItemで取得
         request_items = {
-            table.table_name: {
+            TABLE_NAME: {
                 "Keys": [
-                    {"PK": f"POST#{post_id}", "SK": "META"} for post_id in post_ids
+                    {"PK": {"S": f"POST#{post_id}"}, "SK": {"S": "META"}}
+                    for post_id in post_ids
                 ]
             }
         }
 
-        batch_response = table.meta.client.batch_get_item(RequestItems=request_items)
+        batch_response = dynamodb_client.batch_get_item(RequestItems=request_items)
 
         # バッチ処理のレスポンスの中から必要なデータを取り出し、配列を生成
-        for item in batch_response.get("Responses", {}).get(table.table_name, []):
+        for raw_item in batch_response.get("Responses", {}).get(TABLE_NAME, []):
+            item = decode_item(raw_item)
             post_detail = {
                 "post_id": item["PK"].split("#")[1],
                 "username": item["user_id"].replace("USER#", ""),
@@ -647,6 +1046,8 @@ def db_get_user_liked_posts_paginated(
                 "recommend3": item["recommend3"],
                 "created_at": item["created_at"],
                 "updated_at": item["updated_at"],
+                "like_count": int(item.get("like_count", 0)),
+                "comment_count": int(item.get("comment_count", 0)),
             }
             liked_posts.append(post_detail)
 
@@ -655,12 +1056,15 @@ def db_get_user_liked_posts_paginated(
         liked_posts.sort(key=lambda x: post_order.get(x["post_id"], 999))
 
         logger.info(
-            f"[CRUD] User liked posts retrieved successfully: username={username}, count={len(liked_posts)}, has_more={response.get('LastEvaluatedKey') is not None}"
+            "[CRUD] User liked posts retrieved successfully: username=%s, count=%s, has_more=%s",
+            username,
+            len(liked_posts),
+            last_key is not None,
         )
 
         result = {
             "posts": liked_posts,
-            "last_evaluated_key": response.get("LastEvaluatedKey"),
+            "last_evaluated_key": last_key,
             "count": len(liked_posts),
         }
 
@@ -18,6 +18,7 @@ from app.exceptions import (
     UserAuthenticationError,
     LoginError,
     DatabaseError,
+    PasswordHasherBusyError,
 )
 
 logger = logging.getLogger(__name__)
@@ -26,7 +27,7 @@ auth = AuthJwtCsrf()
 
 # ユーザー名の重複を防ぐため、トランザクション処理に変更予定
 def db_create_user(username: str, password_hash: str) -> Union[dict, bool]:
-    logger.info(f"[CRUD] Creating user: username={username}")
+    logger.info("[CRUD] Creating user: username=%s", username)
 
     try:
         now = datetime.now(timezone.utc).isoformat()
@@ -48,7 +49,9 @@ def db_create_user(username: str, password_hash: str) -> Union[dict, bool]:
         result = {"id": user_id, "username": username, "created_at": now}
 
         logger.info(
-            f"[CRUD] User created successfully: username={username}, user_id={user_id}"
+            "[CRUD] User created successfully: username=%s, user_id=%s",
+            username,
+            user_id,
         )
         return result
 
@@ -95,7 +98,7 @@ def db_create_user(username: str, password_hash: str) -> Union[dict, bool]:
 
 # ユーザー取得
 def db_get_user_by_username(username: str) -> Union[dict, None]:
-    logger.info(f"[CRUD] Getting user by username: username={username}")
+    logger.info("[CRUD] Getting user by username: username=%s", username)
 
     try:
         response = table.query(
@@ -114,14 +117,14 @@ def db_get_user_by_username(username: str) -> Union[dict, None]:
                     if field not in user:
                         raise KeyError(field)
 
-                logger.info(f"[CRUD] User found successfully: username={username}")
+                logger.info("[CRUD] User found successfully: username=%s", username)
                 return user
 
             except KeyError as e:
                 logger.warning(f"[CRUD] Invalid user data - missing field: {str(e)}")
                 return None
 
-        logger.info(f"[CRUD] User not found: username={username}")
+        logger.info("[CRUD] User not found: username=%s", username)
         return None
 
     except ClientError as e:
@@ -164,7 +167,7 @@ def db_signup(data: dict) -> dict:
     username = data.username
     password = data.password
 
-    logger.info(f"[CRUD] Starting user signup: username={username}")
+    logger.info("[CRUD] Starting user signup: username=%s", username)
 
     # ユーザー名の重複チェック
     overlap_user = db_get_user_by_username(username)
@@ -187,9 +190,13 @@ def db_signup(data: dict) -> dict:
     try:
         # 問題がなければユーザーを作成
         new_user = db_create_user(username, auth.generate_hashed_pw(password))
-        logger.info(f"[CRUD] User signup completed successfully: username={username}")
+        logger.info("[CRUD] User signup completed successfully: username=%s", username)
         return new_user
 
+    except PasswordHasherBusyError:
+        # 混雑時は503で返すので再スロー
+        raise
+
     except Exception as e:
         logger.error(
             f"[CRUD] Unexpected error in db_signup: username={username}", exc_info=True
@@ -203,7 +210,7 @@ def db_login(data: dict) -> tuple[str, dict]:  # JWTを返却
     username = data.username
     password = data.password
 
-    logger.info(f"[CRUD] Starting user login: username={username}")
+    logger.info("[CRUD] Starting user login: username=%s", username)
     try:
         user_data = db_get_user_by_username(username)
 
@@ -220,11 +227,11 @@ def db_login(data: dict) -> tuple[str, dict]:  # JWTを返却
             )
 
         token = auth.encode_jwt(user_data["username"])
-        logger.info(f"[CRUD] User login completed successfully: username={username}")
+        logger.info("[CRUD] User login completed successfully: username=%s", username)
         return token, user_data["username"]
 
-    except UserAuthenticationError:
-        # 認証エラーは再スロー
+    except (UserAuthenticationError, PasswordHasherBusyError):
+        # 認証エラー・混雑エラーは再スロー
         raise
 
     except Exception as e:
@@ -0,0 +1,61 @@
+from decimal import Decimal
+from typing import Any
+
+# 低レベルclient用のDynamoDB JSON ⇔ Python値の変換
+#
+# boto3のTypeDeserializerは全ての数値をDecimalにし、型ごとにメソッドを引くので
+# 大きなページでは1アイテムあたりのCPUが目立つ。このテーブルで使う型
+# （S, N, BOOL, NULL, L, M）だけを扱い、整数はintのまま返す。
+
+
+def _decode_number(text: str) -> Any:
+    # like_countなど整数がほとんどなので、まずintを試す
+    try:
+        return int(text)
+    except ValueError:
+        return Decimal(text)
+
+
+def decode_value(value: dict) -> Any:
+    """DynamoDB JSONの1属性をPython値に変換する"""
+    if "S" in value:
+        return value["S"]
+    if "N" in value:
+        return _decode_number(value["N"])
+    if "BOOL" in value:
+        return value["BOOL"]
+    if "NULL" in value:
+        return None
+    if "M" in value:
+        return decode_item(value["M"])
+    if "L" in value:
+        return [decode_value(element) for element in value["L"]]
+    raise TypeError(f"Unsupported DynamoDB type: {list(value)}")
+
+
+def decode_item(item: dict) -> dict:
+    """DynamoDB JSONのアイテム（またはキー）をdictに変換する"""
+    return {name: decode_value(value) for name, value in item.items()}
+
+
+def encode_value(value: Any) -> dict:
+    """Python値をDynamoDB JSONの1属性に変換する"""
+    if isinstance(value, str):
+        return {"S": value}
+    # boolはintのサブクラスなので先に判定する
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, Decimal)):
+        return {"N": str(value)}
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, dict):
+        return {"M": encode_item(value)}
+    if isinstance(value, (list, tuple)):
+        return {"L": [encode_value(element) for element in value]}
+    raise TypeError(f"Unsupported type for DynamoDB: {type(value).__name__}")
+
+
+def encode_item(item: dict) -> dict:
+    """dict（アイテムまたはExclusiveStartKey）をDynamoDB JSONに変換する"""
+    return {name: encode_value(value) for name, value in item.items()}
@@ -0,0 +1,179 @@
+import base64
+import hashlib
+import hmac
+import uuid
+from enum import IntEnum
+from decouple import config
+from app.exceptions import InvalidCursorError
+
+# ページネーションカーソル（LastEvaluatedKeyを不透明な文字列にしたもの）
+#
+# 形式: version(1) | kind(1) | post_id | GSI_SK | HMAC-SHA256(先頭16バイト) をbase64url
+# GSIのパーティションキーとSKはkindとscope（カテゴリ名・ユーザー名）から復元するので
+# カーソルには含めず、HMACの対象にだけ含める。別のscopeへの使い回しや改ざんは検証で弾く。
+# コメント一覧（テーブル本体のクエリ）は post_id の代わりに comment_id だけを持つ。
+
+CURSOR_VERSION = 1
+_MAC_SIZE = 16
+_TAG_UUID = 0
+_TAG_TEXT = 1
+
+
+def _derive_key(secret: str, info: bytes) -> bytes:
+    """HKDF-SHA256（RFC 5869、出力32バイト）で秘密鍵から用途別の鍵を導出する"""
+    prk = hmac.new(
+        b"\x00" * hashlib.sha256().digest_size, secret.encode("utf-8"), hashlib.sha256
+    ).digest()
+    return hmac.new(prk, info + b"\x01", hashlib.sha256).digest()
+
+
+# カーソル署名専用の鍵。未設定ならJWT_KEYをそのまま使わず、用途を分けた鍵を導出する
+_cursor_key_setting = config("CURSOR_KEY", default="")
+CURSOR_KEY: bytes = (
+    _cursor_key_setting.encode("utf-8")
+    if _cursor_key_setting
+    else _derive_key(config("JWT_KEY"), b"mugen-reco/pagination-cursor")
+)
+
+
+class CursorKind(IntEnum):
+    POSTS = 1  # GSI_PostList
+    CATEGORY_POSTS = 2  # GSI_Category
+    USER_POSTS = 3  # GSI_UserPosts
+    USER_LIKES = 4  # GSI5_UserLikes
+    COMMENTS = 5  # テーブル本体 POST#<id> / COMMENT#<id>
+
+
+# kindごとのGSIキー属性名とパーティションキーの値
+_GSI_KEYS = {
+    CursorKind.POSTS: ("GSI1_PK", "GSI1_SK", lambda scope: "POST#ALL"),
+    CursorKind.CATEGORY_POSTS: (
+        "GSI2_PK",
+        "GSI2_SK",
+        lambda scope: f"CATEGORY#{scope}",
+    ),
+    CursorKind.USER_POSTS: ("GSI3_PK", "GSI3_SK", lambda scope: f"USER#{scope}"),
+    CursorKind.USER_LIKES: ("GSI5_PK", "GSI5_SK", lambda scope: f"USER#{scope}"),
+}
+
+
+def _base_sk(kind: CursorKind, scope: str) -> str:
+    """テーブル本体のSK（投稿はMETA、いいねはLIKE#ユーザー名）"""
+    return f"LIKE#{scope}" if kind == CursorKind.USER_LIKES else "META"
+
+
+def _sign(kind: CursorKind, scope: str, body: bytes) -> bytes:
+    message = bytes([kind]) + scope.encode("utf-8") + b"\x00" + body
+    digest = hmac.new(CURSOR_KEY, message, hashlib.sha256).digest()
+    return digest[:_MAC_SIZE]
+
+
+def _pack_text(value: str) -> bytes:
+    data = value.encode("utf-8")
+    if len(data) > 0xFFFF:
+        raise ValueError("cursor field too long")
+    return len(data).to_bytes(2, "big") + data
+
+
+def _unpack_text(data: bytes, offset: int) -> tuple[str, int]:
+    length = int.from_bytes(data[offset : offset + 2], "big")
+    start = offset + 2
+    if start + length > len(data):
+        raise ValueError("truncated cursor")
+    return data[start : start + length].decode("utf-8"), start + length
+
+
+def _pack_id(value: str) -> bytes:
+    # UUIDなら16バイトにまとめる
+    try:
+        packed = uuid.UUID(value)
+        if str(packed) == value:
+            return bytes([_TAG_UUID]) + packed.bytes
+    except ValueError:
+        pass
+    return bytes([_TAG_TEXT]) + _pack_text(value)
+
+
+def _unpack_id(data: bytes, offset: int) -> tuple[str, int]:
+    tag = data[offset]
+    if tag == _TAG_UUID:
+        raw = data[offset + 1 : offset + 17]
+        if len(raw) != 16:
+            raise ValueError("truncated cursor")
+        return str(uuid.UUID(bytes=raw)), offset + 17
+    if tag == _TAG_TEXT:
+        return _unpack_text(data, offset + 1)
+    raise ValueError("unknown id tag")
+
+
+def _pack_key(kind: CursorKind, scope: str, last_evaluated_key: dict) -> bytes:
+    if kind == CursorKind.COMMENTS:
+        if last_evaluated_key.get("PK") != f"POST#{scope}" or not str(
+            last_evaluated_key.get("SK", "")
+        ).startswith("COMMENT#"):
+            raise ValueError(f"unexpected LastEvaluatedKey layout for {kind.name}")
+        return _pack_id(last_evaluated_key["SK"].removeprefix("COMMENT#"))
+
+    gsi_pk_attr, gsi_sk_attr, gsi_pk_value = _GSI_KEYS[kind]
+    if (
+        last_evaluated_key.get(gsi_pk_attr) != gsi_pk_value(scope)
+        or last_evaluated_key.get("SK") != _base_sk(kind, scope)
+        or not str(last_evaluated_key.get("PK", "")).startswith("POST#")
+    ):
+        raise ValueError(f"unexpected LastEvaluatedKey layout for {kind.name}")
+
+    return _pack_id(last_evaluated_key["PK"].removeprefix("POST#")) + _pack_text(
+        last_evaluated_key[gsi_sk_attr]
+    )
+
+
+def _unpack_key(kind: CursorKind, scope: str, body: bytes) -> dict:
+    if kind == CursorKind.COMMENTS:
+        comment_id, offset = _unpack_id(body, 2)
+        if offset != len(body):
+            raise ValueError("trailing cursor data")
+        return {"PK": f"POST#{scope}", "SK": f"COMMENT#{comment_id}"}
+
+    post_id, offset = _unpack_id(body, 2)
+    gsi_sk, offset = _unpack_text(body, offset)
+    if offset != len(body):
+        raise ValueError("trailing cursor data")
+
+    gsi_pk_attr, gsi_sk_attr, gsi_pk_value = _GSI_KEYS[kind]
+    return {
+        "PK": f"POST#{post_id}",
+        "SK": _base_sk(kind, scope),
+        gsi_pk_attr: gsi_pk_value(scope),
+        gsi_sk_attr: gsi_sk,
+    }
+
+
+def encode_cursor(kind: CursorKind, scope: str, last_evaluated_key: dict) -> str:
+    """DynamoDBのLastEvaluatedKeyを署名付きカーソル文字列に変換する"""
+    body = bytes([CURSOR_VERSION, kind]) + _pack_key(kind, scope, last_evaluated_key)
+    token = body + _sign(kind, scope, body)
+    return base64.urlsafe_b64encode(token).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(kind: CursorKind, scope: str, cursor: str) -> dict:
+    """カーソル文字列を検証してExclusiveStartKeyに戻す（不正ならInvalidCursorError）"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        token = base64.urlsafe_b64decode(padded.encode("ascii"))
+        if len(token) <= 2 + _MAC_SIZE:
+            raise ValueError("cursor too short")
+
+        body, mac = token[:-_MAC_SIZE], token[-_MAC_SIZE:]
+        if body[0] != CURSOR_VERSION:
+            raise ValueError("unsupported cursor version")
+        if body[1] != kind:
+            raise ValueError("cursor kind mismatch")
+        if not hmac.compare_digest(mac, _sign(kind, scope, body)):
+            raise ValueError("invalid cursor signature")
+
+        return _unpack_key(kind, scope, body)
+
+    except (ValueError, IndexError, UnicodeError) as e:
+        raise InvalidCursorError(
+            message="ページネーションカーソルが不正です。", original_error=e
+        )
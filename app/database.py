@@ -1,17 +1,128 @@
 import os
-import boto3
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+import threading
 
 IS_LOCAL = os.getenv("IS_LOCAL", "false").lower() == "true"
 
+TABLE_NAME = "MugenRecoTable"
+
+# asyncハンドラーから同期のDynamoDB処理を同時に実行できる上限（＝スレッド数）
+# boto3は同期クライアントなので、1ワーカーで同時に処理できる呼び出し数はこの値で頭打ちになる
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "100"))
+
+# botocoreの接続・リトライ設定（既定のプール10本ではスレッドが接続待ちになる）
+# standard/adaptiveモードはリトライ回数に加えて、失敗が続くとリトライを抑える
+# リトライクォータ（トークンバケット）を持つ
+DYNAMODB_MAX_POOL_CONNECTIONS = int(
+    os.getenv("DYNAMODB_MAX_POOL_CONNECTIONS", str(DB_MAX_CONCURRENCY))
+)
+DYNAMODB_TCP_KEEPALIVE = os.getenv("DYNAMODB_TCP_KEEPALIVE", "true").lower() == "true"
+DYNAMODB_CONNECT_TIMEOUT = float(os.getenv("DYNAMODB_CONNECT_TIMEOUT", "2"))
+DYNAMODB_READ_TIMEOUT = float(os.getenv("DYNAMODB_READ_TIMEOUT", "5"))
+DYNAMODB_RETRY_MODE = os.getenv("DYNAMODB_RETRY_MODE", "standard")
+DYNAMODB_MAX_ATTEMPTS = int(os.getenv("DYNAMODB_MAX_ATTEMPTS", "3"))
+
 if IS_LOCAL:
-    dynamodb = boto3.resource(
-        "dynamodb",
-        endpoint_url="http://localhost:8000",
+    connection_params = {
+        "endpoint_url": "http://localhost:8000",
+        "aws_access_key_id": "DUMMYID",
+        "aws_secret_access_key": "DUMMYKEY",
+    }
+else:
+    connection_params = {}
+
+
+class _LazyProxy:
+    """初回の属性アクセスで実体を生成し、以降はその実体に委譲する
+
+    boto3のセッション・resource・clientの生成（サービス定義の読み込み）は
+    コールドスタートで重いので、import時ではなく最初のDynamoDB呼び出しまで遅らせる。
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _resolve(self) -> Any:
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _get_session():
+    """resourceとclientで認証情報の解決を共有するセッション"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import boto3
+                from app.db_metrics import register_db_metrics_hooks
+
+                session = boto3.session.Session()
+                # resource・clientどちらの呼び出しもリクエストごとに集計する
+                register_db_metrics_hooks(session.events)
+                _session = session
+    return _session
+
+
+def _boto_config():
+    from botocore.config import Config
+
+    return Config(
         region_name="ap-northeast-1",
-        aws_access_key_id="DUMMYID",
-        aws_secret_access_key="DUMMYKEY",
+        max_pool_connections=DYNAMODB_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=DYNAMODB_TCP_KEEPALIVE,
+        connect_timeout=DYNAMODB_CONNECT_TIMEOUT,
+        read_timeout=DYNAMODB_READ_TIMEOUT,
+        retries={"mode": DYNAMODB_RETRY_MODE, "max_attempts": DYNAMODB_MAX_ATTEMPTS},
     )
-else:
-    dynamodb = boto3.resource("dynamodb", region_name="ap-northeast-1")
 
-table = dynamodb.Table("MugenRecoTable")
+
+dynamodb = _LazyProxy(
+    lambda: _get_session().resource(
+        "dynamodb", config=_boto_config(), **connection_params
+    )
+)
+table = _LazyProxy(lambda: dynamodb.Table(TABLE_NAME))
+
+# 低レベルclient: resource層の型変換（Decimal化など）を通らないホットパス用
+# 値はDynamoDB JSON（{"S": "..."}, {"N": "1"}）のまま受け渡す
+dynamodb_client = _LazyProxy(
+    lambda: _get_session().client(
+        "dynamodb", config=_boto_config(), **connection_params
+    )
+)
+
+# uvicornの既定スレッドプール（40）とは別の、DynamoDB I/O専用のプール
+_db_executor = ThreadPoolExecutor(
+    max_workers=DB_MAX_CONCURRENCY, thread_name_prefix="dynamodb"
+)
+
+T = TypeVar("T")
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """同期のCRUD処理を専用スレッドで実行し、イベントループを塞がないようにする
+
+    非同期のDynamoDBクライアントではないので、呼び出しごとにスレッドを1つ占有する。
+    同時実行数の上限はDB_MAX_CONCURRENCYで、それを超えた分はスレッドの空き待ちになる。
+    """
+    loop = asyncio.get_running_loop()
+    # contextvarsを引き継いでワーカースレッドで実行
+    context = contextvars.copy_context()
+    call = functools.partial(func, *args, **kwargs)
+    return await loop.run_in_executor(_db_executor, context.run, call)
@@ -0,0 +1,195 @@
+import contextvars
+import logging
+import threading
+import time
+from typing import Any, Optional
+from decouple import config
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# レスポンスにServer-Timingヘッダーを付けるか（呼び出し回数などが外から見える）
+SERVER_TIMING_ENABLED = config("SERVER_TIMING_ENABLED", default=True, cast=bool)
+
+# ReturnConsumedCapacityを受け付けるオペレーション（読み取り / 書き込み）
+_READ_OPERATIONS = frozenset(
+    {"GetItem", "Query", "Scan", "BatchGetItem", "TransactGetItems"}
+)
+_WRITE_OPERATIONS = frozenset(
+    {
+        "PutItem",
+        "UpdateItem",
+        "DeleteItem",
+        "BatchWriteItem",
+        "TransactWriteItems",
+    }
+)
+_CAPACITY_OPERATIONS = _READ_OPERATIONS | _WRITE_OPERATIONS
+
+
+class RequestDbMetrics:
+    """1リクエスト中のDynamoDB呼び出し回数・消費キャパシティ（RCU/WCU）・所要時間
+
+    投稿削除の並列処理など複数スレッドから同時に記録されるのでロックで守る。
+    time_msは各呼び出しの所要時間の合計（並列に呼んだ分はリクエスト時間を超えうる）。
+    """
+
+    def __init__(self):
+        self.calls: dict[str, int] = {}
+        self.read_capacity = 0.0
+        self.write_capacity = 0.0
+        self.time_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(
+        self, operation: str, elapsed_ms: float, capacity: tuple[float, float]
+    ) -> None:
+        read, write = capacity
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            self.read_capacity += read
+            self.write_capacity += write
+            self.time_ms += elapsed_ms
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+_current: contextvars.ContextVar[Optional[RequestDbMetrics]] = contextvars.ContextVar(
+    "request_db_metrics", default=None
+)
+
+
+def current_db_metrics() -> Optional[RequestDbMetrics]:
+    """実行中のリクエストの集計（リクエスト外ならNone）"""
+    return _current.get()
+
+
+def _split_capacity(operation: str, consumed: Any) -> tuple[float, float]:
+    """ConsumedCapacityを(RCU, WCU)に分ける
+
+    単一アイテム操作はdict、Batch/Transact系はテーブルごとのlistで返る。
+    Read/WriteCapacityUnitsがあればそれを使い、CapacityUnitsしかない場合は
+    オペレーションの種類で読み取り・書き込みに振り分ける。
+    """
+    if isinstance(consumed, dict):
+        entries = [consumed]
+    elif isinstance(consumed, list):
+        entries = consumed
+    else:
+        return 0.0, 0.0
+
+    read = write = 0.0
+    for entry in entries:
+        if "ReadCapacityUnits" in entry or "WriteCapacityUnits" in entry:
+            read += float(entry.get("ReadCapacityUnits", 0))
+            write += float(entry.get("WriteCapacityUnits", 0))
+        elif operation in _WRITE_OPERATIONS:
+            write += float(entry.get("CapacityUnits", 0))
+        else:
+            read += float(entry.get("CapacityUnits", 0))
+    return read, write
+
+
+def _request_consumed_capacity(params: dict, model: Any, **kwargs: Any) -> None:
+    if model.name in _CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+
+def _start_timer(context: dict, **kwargs: Any) -> None:
+    context["db_metrics_start"] = time.perf_counter()
+
+
+def _record_call(parsed: dict, model: Any, context: dict, **kwargs: Any) -> None:
+    metrics = _current.get()
+    start = context.get("db_metrics_start")
+    if metrics is None or start is None:
+        return
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    metrics.record(
+        model.name,
+        elapsed_ms,
+        _split_capacity(model.name, parsed.get("ConsumedCapacity")),
+    )
+
+
+def register_db_metrics_hooks(events: Any) -> None:
+    """botocoreのイベントにフックを登録する（セッション生成時に1回だけ呼ぶ）
+
+    before-call/after-callは呼び出し元のスレッドで実行されるので、
+    contextvarsを引き継いだスレッド（run_dbなど）からの呼び出しが集計される。
+    """
+    events.register("provide-client-params.dynamodb", _request_consumed_capacity)
+    events.register("before-call.dynamodb", _start_timer)
+    events.register("after-call.dynamodb", _record_call)
+
+
+def _server_timing(metrics: RequestDbMetrics) -> str:
+    return (
+        f'dynamodb;dur={metrics.time_ms:.1f};desc="calls={metrics.total_calls} '
+        f'rcu={metrics.read_capacity:g} wcu={metrics.write_capacity:g}"'
+    )
+
+
+class DbMetricsMiddleware:
+    """リクエストごとにDynamoDBの集計を用意し、Server-Timingとアクセスログに出すASGIミドルウェア
+
+    Server-Timingはレスポンス開始時点までの集計、アクセスログはバックグラウンド
+    タスク（投稿削除の続きなど）も含めた最終的な集計になる。
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestDbMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", _server_timing(metrics))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            duration_ms = (time.perf_counter() - started) * 1000
+            logger.info(
+                "[ACCESS] %s %s %s %.1fms db_calls=%s db_rcu=%g db_wcu=%g db_ms=%.1f",
+                scope["method"],
+                route,
+                status_code,
+                duration_ms,
+                metrics.total_calls,
+                metrics.read_capacity,
+                metrics.write_capacity,
+                metrics.time_ms,
+                extra={
+                    "event_type": "access",
+                    "method": scope["method"],
+                    "route": route,
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 1),
+                    "db_calls": metrics.total_calls,
+                    "db_calls_by_operation": dict(metrics.calls),
+                    "db_read_capacity": metrics.read_capacity,
+                    "db_write_capacity": metrics.write_capacity,
+                    "db_time_ms": round(metrics.time_ms, 1),
+                },
+            )
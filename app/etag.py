@@ -0,0 +1,35 @@
+import hashlib
+from typing import Any, Optional
+from fastapi import Request, Response
+
+
+def build_weak_etag(*parts: Any) -> str:
+    """レスポンス内容を決める値から弱いETagを生成する"""
+    digest = hashlib.sha1(
+        "|".join(str(part) for part in parts).encode("utf-8")
+    ).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """If-None-Matchが現在のETagと一致するか（弱い比較）"""
+    if_none_match: Optional[str] = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    current = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        if candidate.strip().removeprefix("W/") == current:
+            return True
+    return False
+
+
+def not_modified_response(etag: str, vary: Optional[str] = None) -> Response:
+    """ボディなしの304レスポンス"""
+    headers = {"ETag": etag}
+    if vary:
+        headers["Vary"] = vary
+    return Response(status_code=304, headers=headers)
@@ -260,3 +260,21 @@ class CategoryRetrievalError(Exception):
         self.message = message
         self.original_error = original_error
         super().__init__(self.message)
+
+
+class InvalidCursorError(Exception):
+    """ページネーションカーソル不正エラー"""
+
+    def __init__(self, message: str, original_error: Exception = None):
+        self.message = message
+        self.original_error = original_error
+        super().__init__(self.message)
+
+
+class PasswordHasherBusyError(Exception):
+    """パスワードハッシュ処理の混雑エラー"""
+
+    def __init__(self, message: str, original_error: Exception = None):
+        self.message = message
+        self.original_error = original_error
+        super().__init__(self.message)
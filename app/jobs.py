@@ -0,0 +1,25 @@
+from decouple import config
+from app.config.logging_config import LoggingConfig
+from app.cruds.crud_post import db_resume_pending_post_deletions
+import logging
+
+LoggingConfig.setup_logging()
+logger = logging.getLogger(__name__)
+
+# Lambdaのタイムアウトより短くして、途中の投稿は次回に持ち越す
+DELETE_RESUME_BUDGET_SECONDS = config(
+    "DELETE_RESUME_BUDGET_SECONDS", default=240.0, cast=float
+)
+
+
+def resume_post_deletions_handler(event, context):
+    """削除待ちの投稿の関連アイテムを削除する（EventBridgeのスケジュールで実行）"""
+    try:
+        return db_resume_pending_post_deletions(DELETE_RESUME_BUDGET_SECONDS)
+    finally:
+        LoggingConfig.flush()
+
+
+if __name__ == "__main__":
+    # 手動で再実行する場合: python -m app.jobs
+    print(resume_post_deletions_handler(None, None))
@@ -1,7 +1,12 @@
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import dynamodb, table
+from app.database import dynamodb_client, table, run_db
+from app.cache import get_cache_stats
+from app.auth.password_hasher import get_password_hasher_stats
+from app.responses import FastJSONResponse
+from app.compression import COMPRESSION_ENABLED, CompressionMiddleware
+from app.db_metrics import DbMetricsMiddleware
 from app.routers import (
     route_post,
     route_category,
@@ -43,8 +48,11 @@ from app.exceptions import (
     LikeNotFoundError,
     LikeOwnershipError,
     CategoryRetrievalError,
+    InvalidCursorError,
+    PasswordHasherBusyError,
 )
-import datetime
+from datetime import datetime, timezone
+from decouple import config
 from app.config.logging_config import LoggingConfig
 import logging
 
@@ -54,7 +62,13 @@ LoggingConfig.setup_logging()
 # main.py用のloggerを取得
 logger = logging.getLogger(__name__)  # または logger = logging.getLogger('main')
 
-app = FastAPI()
+
+def _utc_timestamp() -> str:
+    """エラーレスポンス用のUTC時刻（末尾Z）"""
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
 
 # 例外を階層化する
@@ -79,7 +93,7 @@ async def database_error_handler(request: Request, exc: DatabaseError):
         content={
             "error": "DATABASE_ERROR",
             "message": "データベース処理中にエラーが発生しました",
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -95,13 +109,13 @@ async def post_retrieval_error_handler(request: Request, exc: PostRetrievalError
 
 @app.exception_handler(PostNotFoundError)
 async def post_not_found_error_handler(request: Request, exc: PostNotFoundError):
-    logger.info(f"Post not found: {exc.message}")
+    logger.info("Post not found: %s", exc.message)
     return JSONResponse(
         status_code=404,  # Not Found
         content={
             "error": "POST_NOT_FOUND",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -119,7 +133,7 @@ async def post_creation_error_handler(request: Request, exc: PostCreationError):
         content={
             "error": "POST_CREATION_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -132,7 +146,7 @@ async def post_ownership_error_handler(request: Request, exc: PostOwnershipError
         content={
             "error": "POST_OWNERSHIP_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -147,7 +161,7 @@ async def password_validation_error_handler(
         content={
             "error": "PASSWORD_VALIDATION_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -162,7 +176,7 @@ async def username_already_exists_error_handler(
         content={
             "error": "USERNAME_ALREADY_EXISTS",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -176,7 +190,7 @@ async def user_creation_error_handler(request: Request, exc: UserCreationError):
         content={
             "error": "USER_CREATION_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -191,7 +205,7 @@ async def user_already_exists_error_handler(
         content={
             "error": "USER_ALREADY_EXISTS",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -204,7 +218,7 @@ async def signup_error_handler(request: Request, exc: SignupError):
         content={
             "error": "SIGNUP_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -219,7 +233,7 @@ async def user_authentication_error_handler(
         content={
             "error": "AUTHENTICATION_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -232,7 +246,7 @@ async def login_error_handler(request: Request, exc: LoginError):
         content={
             "error": "LOGIN_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -245,7 +259,7 @@ async def user_retrieval_error_handler(request: Request, exc: UserRetrievalError
         content={
             "error": "USER_RETRIEVAL_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -259,7 +273,7 @@ async def post_update_error_handler(request: Request, exc: PostUpdateError):
         content={
             "error": "POST_UPDATE_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -272,20 +286,20 @@ async def post_deletion_error_handler(request: Request, exc: PostDeletionError):
         content={
             "error": "POST_DELETION_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
 
 @app.exception_handler(PostNotFoundError)
 async def post_not_found_error_handler(request: Request, exc: PostNotFoundError):
-    logger.info(f"Post not found: {exc.message}")
+    logger.info("Post not found: %s", exc.message)
     return JSONResponse(
         status_code=404,  # Not Found
         content={
             "error": "POST_NOT_FOUND",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -298,7 +312,7 @@ async def user_permission_error_handler(request: Request, exc: UserPermissionErr
         content={
             "error": "USER_PERMISSION_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -312,7 +326,7 @@ async def comment_creation_error_handler(request: Request, exc: CommentCreationE
         content={
             "error": "COMMENT_CREATION_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -325,20 +339,20 @@ async def comment_retrieval_error_handler(request: Request, exc: CommentRetrieva
         content={
             "error": "COMMENT_RETRIEVAL_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
 
 @app.exception_handler(CommentNotFoundError)
 async def comment_not_found_error_handler(request: Request, exc: CommentNotFoundError):
-    logger.info(f"Comment not found: {exc.message}")
+    logger.info("Comment not found: %s", exc.message)
     return JSONResponse(
         status_code=404,  # Not Found
         content={
             "error": "COMMENT_NOT_FOUND",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -351,7 +365,7 @@ async def comment_deletion_error_handler(request: Request, exc: CommentDeletionE
         content={
             "error": "COMMENT_DELETION_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -364,7 +378,7 @@ async def comment_ownership_error_handler(request: Request, exc: CommentOwnershi
         content={
             "error": "COMMENT_OWNERSHIP_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -378,7 +392,7 @@ async def like_retrieval_error_handler(request: Request, exc: LikeRetrievalError
         content={
             "error": "LIKE_RETRIEVAL_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -387,13 +401,13 @@ async def like_retrieval_error_handler(request: Request, exc: LikeRetrievalError
 async def like_already_exists_error_handler(
     request: Request, exc: LikeAlreadyExistsError
 ):
-    logger.info(f"Like already exists: {exc.message}")
+    logger.info("Like already exists: %s", exc.message)
     return JSONResponse(
         status_code=409,  # Conflict
         content={
             "error": "LIKE_ALREADY_EXISTS",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -406,7 +420,7 @@ async def like_creation_error_handler(request: Request, exc: LikeCreationError):
         content={
             "error": "LIKE_CREATION_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -419,20 +433,20 @@ async def like_deletion_error_handler(request: Request, exc: LikeDeletionError):
         content={
             "error": "LIKE_DELETION_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
 
 @app.exception_handler(LikeNotFoundError)
 async def like_not_found_error_handler(request: Request, exc: LikeNotFoundError):
-    logger.info(f"Like not found: {exc.message}")
+    logger.info("Like not found: %s", exc.message)
     return JSONResponse(
         status_code=404,  # Not Found
         content={
             "error": "LIKE_NOT_FOUND",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -445,7 +459,7 @@ async def like_ownership_error_handler(request: Request, exc: LikeOwnershipError
         content={
             "error": "LIKE_OWNERSHIP_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -460,7 +474,36 @@ async def category_retrieval_error_handler(
         content={
             "error": "CATEGORY_RETRIEVAL_ERROR",
             "message": exc.message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
+        },
+    )
+
+
+@app.exception_handler(InvalidCursorError)
+async def invalid_cursor_error_handler(request: Request, exc: InvalidCursorError):
+    logger.warning(f"Invalid cursor: {exc.message}")
+    return JSONResponse(
+        status_code=400,
+        content={
+            "error": "INVALID_CURSOR",
+            "message": exc.message,
+            "timestamp": _utc_timestamp(),
+        },
+    )
+
+
+@app.exception_handler(PasswordHasherBusyError)
+async def password_hasher_busy_error_handler(
+    request: Request, exc: PasswordHasherBusyError
+):
+    logger.warning(f"Password hasher busy: {exc.message}")
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "1"},
+        content={
+            "error": "PASSWORD_HASHER_BUSY",
+            "message": exc.message,
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -488,7 +531,7 @@ async def general_exception_handler(request: Request, exc: Exception):
         content={
             "error": "INTERNAL_SERVER_ERROR",
             "message": "予期しないエラーが発生しました。",
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _utc_timestamp(),
         },
     )
 
@@ -515,6 +558,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 一覧・コメントなどのJSONを圧縮（最後に追加したミドルウェアが一番外側で動く）
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# リクエストごとのDynamoDB呼び出し回数・消費キャパシティをServer-Timingとアクセスログに出す
+app.add_middleware(DbMetricsMiddleware)
+
 
 @CsrfProtect.load_config
 def get_csrf_config():
@@ -528,18 +578,47 @@ def csrf_protect_exception_handler(request: Request, exc: CsrfProtectError):
 
 
 @app.get("/", response_model=SuccessMsg)
-def read_root():
+async def read_root():
     return {"message": "Welcome to Fast API"}
 
 
 @app.get("/ping-dynamodb")
-def ping_dynamodb():
+async def ping_dynamodb():
     try:
-        tables = dynamodb.list_tables()
+        tables = await run_db(dynamodb_client.list_tables)
         return {"status": "ok", "tables": tables.get("TableNames", [])}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+# 診断用エンドポイント（キャッシュの統計など）は本番では公開しない
+STAGE = config("STAGE", default="dev")
+
+
+def _require_non_prod_stage():
+    if STAGE == "prod":
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@app.get("/cache-stats", dependencies=[Depends(_require_non_prod_stage)])
+async def cache_stats():
+    """プロセス内キャッシュのヒット/ミス数"""
+    return get_cache_stats()
+
+
+@app.get("/password-hash-stats", dependencies=[Depends(_require_non_prod_stage)])
+async def password_hash_stats():
+    """パスワードハッシュ用プールの実行中・待ち件数と拒否数"""
+    return get_password_hasher_stats()
+
+
+_mangum_handler = Mangum(app)
+
+
 # Lambdaエントリーポイント
-handler = Mangum(app)
+def handler(event, context):
+    try:
+        return _mangum_handler(event, context)
+    finally:
+        # レスポンス後はプロセスが凍結されるので、キューに残ったログを書き出しておく
+        LoggingConfig.flush()
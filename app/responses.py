@@ -0,0 +1,50 @@
+from decimal import Decimal
+from typing import Any, Iterable
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _default(obj: Any) -> Any:
+    # orjsonが直接扱えない型（resource経由で読んだ数値のDecimalなど）
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """orjsonでレンダリングするJSONレスポンス（アプリ全体の既定）
+
+    UTCのdatetimeはpydanticと同じく末尾Zで出力する。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
+
+
+def _utc_z(value: Any) -> Any:
+    # DynamoDBに保存したISO文字列をpydanticの出力形式（+00:00 → Z）に揃える
+    if isinstance(value, str) and value.endswith("+00:00"):
+        return value[:-6] + "Z"
+    return value
+
+
+def prevalidated_items(
+    items: Iterable[dict], fields: Iterable[str], datetime_fields: Iterable[str]
+) -> list[dict]:
+    """CRUD層で組み立て済みのdictを、response_modelの再検証なしで返す形に整える
+
+    fieldsにない値（countなど）は落とし、日時はpydanticと同じ表記にする。
+    """
+    fields = tuple(fields)
+    datetime_fields = frozenset(datetime_fields)
+    return [
+        {
+            name: _utc_z(item.get(name)) if name in datetime_fields else item.get(name)
+            for name in fields
+        }
+        for item in items
+    ]
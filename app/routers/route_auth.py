@@ -7,6 +7,9 @@ from app.schemas.user import UserBody, UserInfo, UsernameCheckResponse
 from app.auth.auth_utils import AuthJwtCsrf
 from fastapi_csrf_protect import CsrfProtect
 from app.auth.cookie_utils import CookieManager
+from app.database import run_db
+from app.cache import TTLCache
+from decouple import config
 from typing import Annotated
 import logging
 
@@ -15,9 +18,15 @@ router = APIRouter()
 auth = AuthJwtCsrf()
 cookie_manager = CookieManager()
 
+# ユーザー名の重複チェックは入力のたびに呼ばれるので、存在有無を短時間キャッシュする
+USERNAME_CACHE_TTL_SECONDS = config("USERNAME_CACHE_TTL_SECONDS", default=30, cast=int)
+username_exists_cache = TTLCache(
+    "username_exists", maxsize=1024, ttl=USERNAME_CACHE_TTL_SECONDS
+)
+
 
 @router.get("/api/csrftoken", response_model=Csrf)
-def get_csrf_token(csrf_protect: CsrfProtect = Depends()):
+async def get_csrf_token(csrf_protect: CsrfProtect = Depends()):
     logger.info("[ROUTE] Generating CSRF token")
 
     raw_token, signed_token = csrf_protect.generate_csrf_tokens()
@@ -28,40 +37,48 @@ def get_csrf_token(csrf_protect: CsrfProtect = Depends()):
 
 
 @router.post("/api/register", response_model=UserInfo)
-def signup(request: Request, user: UserBody, csrf_protect: CsrfProtect = Depends()):
-    logger.info(f"[ROUTE] User signup request: username={user.username}")
+async def signup(
+    request: Request, user: UserBody, csrf_protect: CsrfProtect = Depends()
+):
+    logger.info("[ROUTE] User signup request: username=%s", user.username)
 
     csrf_token = csrf_protect.get_csrf_from_headers(request.headers)
     csrf_protect.validate_csrf(csrf_token)  # 例外が発生しなければCSRFトークンが有効
     logger.debug("[ROUTE] CSRF token validated successfully")
 
-    new_user = db_signup(user)
-    logger.info(f"[ROUTE] User signup completed successfully: username={user.username}")
+    new_user = await run_db(db_signup, user)
+    # 重複チェックのキャッシュに「利用可能」が残らないよう破棄
+    username_exists_cache.invalidate(user.username)
+    logger.info(
+        "[ROUTE] User signup completed successfully: username=%s", user.username
+    )
     return new_user
 
 
 @router.post("/api/login", response_model=UserInfo)
-def login(
+async def login(
     request: Request,
     response: Response,
     user: UserBody,
     csrf_protect: CsrfProtect = Depends(),
 ):
-    logger.info(f"[ROUTE] User login request: username={user.username}")
+    logger.info("[ROUTE] User login request: username=%s", user.username)
 
     csrf_token = csrf_protect.get_csrf_from_headers(request.headers)
     csrf_protect.validate_csrf(csrf_token)  # 例外が発生しなければCSRFトークンが有効
     logger.debug("[ROUTE] CSRF token validated successfully")
 
-    token, username = db_login(user)
+    token, username = await run_db(db_login, user)
     cookie_manager.set_jwt_cookie(response, token)
 
-    logger.info(f"[ROUTE] User login completed successfully: username={username}")
+    logger.info("[ROUTE] User login completed successfully: username=%s", username)
     return {"username": username}
 
 
 @router.post("/api/logout", response_model=SuccessMsg)
-def logout(request: Request, response: Response, csrf_protect: CsrfProtect = Depends()):
+async def logout(
+    request: Request, response: Response, csrf_protect: CsrfProtect = Depends()
+):
     logger.info("[ROUTE] User logout request")
 
     csrf_token = csrf_protect.get_csrf_from_headers(request.headers)
@@ -75,13 +92,13 @@ def logout(request: Request, response: Response, csrf_protect: CsrfProtect = Dep
 
 
 @router.get("/api/user", response_model=UserInfo)
-def get_user_refresh_jwt(request: Request, response: Response):
+async def get_user_refresh_jwt(request: Request, response: Response):
     logger.info("[ROUTE] Get user and JWT refresh request")
 
     new_token, subject = auth.verify_update_jwt(request)
     cookie_manager.set_jwt_cookie(response, new_token)
 
-    logger.info(f"[ROUTE] JWT refresh completed successfully: username={subject}")
+    logger.info("[ROUTE] JWT refresh completed successfully: username=%s", subject)
     return {"username": subject}
 
 
@@ -101,18 +118,22 @@ async def check_username_availability(
     ],
 ) -> UsernameCheckResponse:
     """ユーザー名の利用可能性をチェック"""
-    logger.info(f"[ROUTE] Checking username availability: username={username}")
+    logger.info("[ROUTE] Checking username availability: username=%s", username)
 
     # ユーザー名が既に存在するかチェック
-    user = db_get_user_by_username(username)
+    user_exists = await run_db(
+        username_exists_cache.get_or_load,
+        username,
+        lambda: db_get_user_by_username(username) is not None,
+    )
 
-    if not user:
+    if not user_exists:
         is_available = True
         message = "このユーザー名は利用可能です"
-        logger.info(f"[ROUTE] Username is available: username={username}")
+        logger.info("[ROUTE] Username is available: username=%s", username)
     else:
         is_available = False
         message = "このユーザー名は既に使用されています"
-        logger.info(f"[ROUTE] Username is not available: username={username}")
+        logger.info("[ROUTE] Username is not available: username=%s", username)
 
     return UsernameCheckResponse(is_available=is_available, message=message)
@@ -1,7 +1,11 @@
 from fastapi import APIRouter
-from fastapi import HTTPException
+from fastapi import HTTPException, Request, Response
 from app.cruds.crud_category import db_get_categories
 from app.schemas.category import CategoryResponse
+from app.database import run_db
+from app.cache import TTLCache
+from app.etag import build_weak_etag, is_not_modified, not_modified_response
+from decouple import config
 from typing import List
 import logging
 
@@ -9,12 +13,24 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# カテゴリはほぼ変更されないので、プロセス内でキャッシュする
+CATEGORY_CACHE_TTL_SECONDS = config("CATEGORY_CACHE_TTL_SECONDS", default=300, cast=int)
+category_cache = TTLCache("categories", maxsize=1, ttl=CATEGORY_CACHE_TTL_SECONDS)
+
 
 @router.get("/api/categories", response_model=List[CategoryResponse])
-def get_categories():
+async def get_categories(request: Request, response: Response):
     logger.info("[ROUTE] Getting all categories")
 
-    categories = db_get_categories()
+    categories = await run_db(category_cache.get_or_load, "all", db_get_categories)
+
+    etag = build_weak_etag(
+        "categories", *(f"{c['id']}:{c['name']}" for c in categories)
+    )
+    if is_not_modified(request, etag):
+        logger.info("[ROUTE] Categories not modified")
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
 
-    logger.info(f"[ROUTE] Categories retrieved successfully: count={len(categories)}")
+    logger.info("[ROUTE] Categories retrieved successfully: count=%s", len(categories))
     return categories
@@ -1,21 +1,27 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from fastapi import Response, Request, HTTPException, Depends
 from app.schemas.common import SuccessMsg
-from app.schemas.comment import CommentBody, CommentResponse
+from app.schemas.comment import (
+    CommentBody,
+    CommentResponse,
+    PaginatedCommentsResponse,
+)
 from app.cruds.crud_comment import (
     db_create_comment,
     db_get_comments,
     db_delete_comment,
-    db_get_single_comment,
 )
+from app.cursor import CursorKind, encode_cursor, decode_cursor
+from app.etag import build_weak_etag, is_not_modified, not_modified_response
+from app.responses import FastJSONResponse, prevalidated_items
 from app.auth.auth_utils import AuthJwtCsrf
+from app.database import run_db
 from fastapi_csrf_protect import CsrfProtect
 from app.auth.cookie_utils import CookieManager
 from starlette.status import HTTP_201_CREATED
-from typing import List
+from typing import Optional
 import logging
 import sys
-from app.exceptions import CommentOwnershipError
 
 # ✅ 基本設定（ファイルの最上部に配置）
 logging.basicConfig(
@@ -30,78 +36,129 @@ router = APIRouter()
 auth = AuthJwtCsrf()
 cookie_manager = CookieManager()
 
+_COMMENT_FIELDS = tuple(CommentResponse.model_fields)
+
 
 @router.post("/api/posts/{post_id}/comments", response_model=CommentResponse)
-def create_comment(
+async def create_comment(
     request: Request,
     response: Response,
     post_id: str,
     data: CommentBody,
     csrf_protect: CsrfProtect = Depends(),
 ):
-    logger.info(f"[ROUTE] Creating comment: post_id={post_id}")
+    logger.info("[ROUTE] Creating comment: post_id=%s", post_id)
 
     new_token, username = auth.verify_csrf_update_jwt(
         request, csrf_protect, request.headers
     )
 
     logger.debug(
-        f"[ROUTE] User authenticated for comment creation: username={username}"
+        "[ROUTE] User authenticated for comment creation: username=%s", username
     )
 
-    res = db_create_comment(username, post_id, data)
+    res = await run_db(db_create_comment, username, post_id, data)
 
     response.status_code = HTTP_201_CREATED
     cookie_manager.set_jwt_cookie(response, new_token)
     logger.info(
-        f"[ROUTE] Comment created successfully: post_id={post_id}, comment_id={res.get('comment_id')}, username={username}"
+        "[ROUTE] Comment created successfully: post_id=%s, comment_id=%s, username=%s",
+        post_id,
+        res.get("comment_id"),
+        username,
     )
     return res
 
 
 # ログインしなくても見れるようにするので、JWT認証は必要なし
-@router.get("/api/posts/{post_id}/comments", response_model=List[CommentResponse])
-def get_comments(post_id: str):
-    logger.info(f"[ROUTE] Getting comments for post: post_id={post_id}")
+@router.get("/api/posts/{post_id}/comments", response_model=PaginatedCommentsResponse)
+async def get_comments(
+    request: Request,
+    response: Response,
+    post_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    last_evaluated_key: Optional[str] = None,
+):
+    logger.info(
+        "[ROUTE] Getting comments for post: post_id=%s, limit=%s, has_last_key=%s",
+        post_id,
+        limit,
+        last_evaluated_key is not None,
+    )
+
+    lek = (
+        decode_cursor(CursorKind.COMMENTS, post_id, last_evaluated_key)
+        if last_evaluated_key
+        else None
+    )
 
-    res = db_get_comments(post_id)
+    res = await run_db(db_get_comments, post_id, limit=limit, last_evaluated_key=lek)
+
+    # コメントは編集できないので、ページ内のIDと続きの位置で内容が決まる
+    # 一覧のクエリ結果からETagを作り、判定のためだけに投稿METAを読まない
+    etag = build_weak_etag(
+        "comments",
+        post_id,
+        limit,
+        last_evaluated_key or "",
+        res["last_evaluated_key"] or "",
+        *(comment["comment_id"] for comment in res["comments"]),
+    )
+    if is_not_modified(request, etag):
+        logger.info("[ROUTE] Comments not modified: post_id=%s", post_id)
+        return not_modified_response(etag)
+
+    # last_evaluated_keyを署名付きカーソルに変換、フロントでなくサーバー側で処理
+    if res["last_evaluated_key"]:
+        res["last_evaluated_key"] = encode_cursor(
+            CursorKind.COMMENTS, post_id, res["last_evaluated_key"]
+        )
 
     logger.info(
-        f"[ROUTE] Comments retrieved successfully: post_id={post_id}, count={len(res)}"
+        "[ROUTE] Comments retrieved successfully: post_id=%s, count=%s",
+        post_id,
+        len(res["comments"]),
+    )
+    # CRUD層で組み立て済みなので、response_modelの再検証を通さずに返す
+    return FastJSONResponse(
+        {
+            "comments": prevalidated_items(
+                res["comments"], _COMMENT_FIELDS, ("created_at",)
+            ),
+            "last_evaluated_key": res["last_evaluated_key"],
+        },
+        headers={"ETag": etag},
     )
-    return res
 
 
 @router.delete("/api/posts/{post_id}/comments/{comment_id}", response_model=SuccessMsg)
-def delete_comment(
+async def delete_comment(
     request: Request,
     response: Response,
     post_id: str,
     comment_id: str,
     csrf_protect: CsrfProtect = Depends(),
 ):
-    logger.info(f"[ROUTE] Deleting comment: post_id={post_id}, comment_id={comment_id}")
+    logger.info(
+        "[ROUTE] Deleting comment: post_id=%s, comment_id=%s", post_id, comment_id
+    )
 
     new_token, username = auth.verify_csrf_update_jwt(
         request, csrf_protect, request.headers
     )
 
     logger.debug(
-        f"[ROUTE] User authenticated for comment deletion: username={username}"
+        "[ROUTE] User authenticated for comment deletion: username=%s", username
     )
 
-    # 認可: コメントの所有者か確認
-    comment = db_get_single_comment(post_id, comment_id)
-    if comment["username"] != username:
-        logger.warning(
-            f"[ROUTE] Unauthorized comment deletion attempt: post_id={post_id}, comment_id={comment_id}, username={username}, owner={comment['username']}"
-        )
-        raise CommentOwnershipError(message="このコメントを削除する権限がありません。")
-
-    res = db_delete_comment(post_id, comment_id)
+    # 認可: 所有者の確認は削除の条件式で行う（CommentOwnershipError）
+    await run_db(db_delete_comment, post_id, comment_id, username)
     cookie_manager.set_jwt_cookie(response, new_token)
 
     logger.info(
-        f"[ROUTE] Comment deleted successfully: post_id={post_id}, comment_id={comment_id}, username={username}"
+        "[ROUTE] Comment deleted successfully: post_id=%s, comment_id=%s, username=%s",
+        post_id,
+        comment_id,
+        username,
     )
     return {"message": f"Comment {comment_id} deleted successfully."}
@@ -8,11 +8,13 @@ from app.cruds.crud_like import (
     db_get_like_status,
     db_get_like_count,
     db_get_like,
+    db_toggle_like,
 )
 from starlette.status import HTTP_201_CREATED
 from typing import List
 from fastapi_csrf_protect import CsrfProtect
 from app.auth.auth_utils import AuthJwtCsrf
+from app.database import run_db
 from app.auth.cookie_utils import CookieManager
 import logging
 from app.exceptions import LikeOwnershipError
@@ -26,59 +28,51 @@ cookie_manager = CookieManager()
 
 # ユーザー本人のいいねなので、認証が必要
 @router.get("/api/posts/{post_id}/likes/status", response_model=LikeStatusResponse)
-def get_like_status(request: Request, post_id: str):
-    logger.info(f"[ROUTE] Getting like status: post_id={post_id}")
+async def get_like_status(request: Request, post_id: str):
+    logger.info("[ROUTE] Getting like status: post_id=%s", post_id)
 
     username = auth.verify_jwt(request)
     logger.debug(
-        f"[ROUTE] User authenticated for like status check: username={username}"
+        "[ROUTE] User authenticated for like status check: username=%s", username
     )
 
-    liked = db_get_like_status(post_id, username)
+    liked = await run_db(db_get_like_status, post_id, username)
 
     logger.info(
-        f"[ROUTE] Like status retrieved successfully: post_id={post_id}, username={username}, liked={liked}"
+        "[ROUTE] Like status retrieved successfully: post_id=%s, username=%s, liked=%s",
+        post_id,
+        username,
+        liked,
     )
     return {"liked": liked}
 
 
 @router.post("/api/posts/{post_id}/like-toggle", response_model=LikeToggleResponse)
-def toggle_like(
+async def toggle_like(
     request: Request,
     response: Response,
     post_id: str,
     csrf_protect: CsrfProtect = Depends(),
 ):
-    logger.info(f"[ROUTE] Toggling like: post_id={post_id}")
+    logger.info("[ROUTE] Toggling like: post_id=%s", post_id)
 
     new_token, username = auth.verify_csrf_update_jwt(
         request, csrf_protect, request.headers
     )
-    logger.debug(f"[ROUTE] User authenticated for like toggle: username={username}")
+    logger.debug("[ROUTE] User authenticated for like toggle: username=%s", username)
 
-    current_status = db_get_like_status(post_id, username)
-    logger.debug(
-        f"[ROUTE] Current like status: post_id={post_id}, username={username}, current_status={current_status}"
-    )
-
-    if current_status:
-        # いいねを解除
-        db_remove_like(post_id, username)
-        is_liked = False
-        action = "removed"
-    else:
-        # いいねを追加
-        db_add_like(post_id, username)
-        is_liked = True
-        action = "added"
-
-    # 総いいね数を取得
-    like_count = db_get_like_count(post_id)
+    # いいね有無の判定・書き込み・いいね数の算出をまとめて1つのCRUDで行う
+    is_liked, like_count = await run_db(db_toggle_like, post_id, username)
+    action = "added" if is_liked else "removed"
 
     cookie_manager.set_jwt_cookie(response, new_token)
 
     logger.info(
-        f"[ROUTE] Like toggled successfully: post_id={post_id}, username={username}, action={action}, new_status={is_liked}"
+        "[ROUTE] Like toggled successfully: post_id=%s, username=%s, action=%s, new_status=%s",
+        post_id,
+        username,
+        action,
+        is_liked,
     )
     return {
         "message": f"Like {action} successfully",
@@ -90,66 +84,68 @@ def toggle_like(
 
 # エラーハンドリング必要 exception_handlerを設定する
 @router.post("/api/posts/{post_id}/likes", response_model=SuccessMsg)
-def like_post(
+async def like_post(
     request: Request,
     response: Response,
     post_id: str,
     csrf_protect: CsrfProtect = Depends(),
 ):
-    logger.info(f"[ROUTE] Adding like: post_id={post_id}")
+    logger.info("[ROUTE] Adding like: post_id=%s", post_id)
 
     new_token, username = auth.verify_csrf_update_jwt(
         request, csrf_protect, request.headers
     )
-    logger.debug(f"[ROUTE] User authenticated for like addition: username={username}")
+    logger.debug("[ROUTE] User authenticated for like addition: username=%s", username)
 
-    db_add_like(post_id, username)
+    await run_db(db_add_like, post_id, username)
     cookie_manager.set_jwt_cookie(response, new_token)
 
     logger.info(
-        f"[ROUTE] Like added successfully: post_id={post_id}, username={username}"
+        "[ROUTE] Like added successfully: post_id=%s, username=%s", post_id, username
     )
     return {"message": "Like added successfully"}
 
 
 @router.delete("/api/posts/{post_id}/likes", response_model=SuccessMsg)
-def unlike_post(
+async def unlike_post(
     request: Request,
     response: Response,
     post_id: str,
     csrf_protect: CsrfProtect = Depends(),
 ):
-    logger.info(f"[ROUTE] Removing like: post_id={post_id}")
+    logger.info("[ROUTE] Removing like: post_id=%s", post_id)
 
     new_token, username = auth.verify_csrf_update_jwt(
         request, csrf_protect, request.headers
     )
-    logger.debug(f"[ROUTE] User authenticated for like removal: username={username}")
+    logger.debug("[ROUTE] User authenticated for like removal: username=%s", username)
 
     # 認可チェック
-    like = db_get_like(post_id, username)
+    like = await run_db(db_get_like, post_id, username)
     if like["username"] != username:
         logger.warning(
             f"[ROUTE] Unauthorized like deletion attempt: post_id={post_id}, username={username}"
         )
         raise LikeOwnershipError(message="このいいねを削除する権限がありません。")
 
-    db_remove_like(post_id, username)
+    await run_db(db_remove_like, post_id, username)
     cookie_manager.set_jwt_cookie(response, new_token)
 
     logger.info(
-        f"[ROUTE] Like removed successfully: post_id={post_id}, username={username}"
+        "[ROUTE] Like removed successfully: post_id=%s, username=%s", post_id, username
     )
     return {"message": "Like removed successfully"}
 
 
 # 誰ても投稿についているいいね数は見れる
 @router.get("/api/posts/{post_id}/likes", response_model=LikeCountResponse)
-def get_like_count(post_id: str):
-    logger.info(f"[ROUTE] Getting like count: post_id={post_id}")
+async def get_like_count(post_id: str):
+    logger.info("[ROUTE] Getting like count: post_id=%s", post_id)
 
-    count = db_get_like_count(post_id)
+    count = await run_db(db_get_like_count, post_id)
     logger.info(
-        f"[ROUTE] Like count retrieved successfully: post_id={post_id}, count={count}"
+        "[ROUTE] Like count retrieved successfully: post_id=%s, count=%s",
+        post_id,
+        count,
     )
     return {"like_count": count}
@@ -3,7 +3,6 @@ from fastapi import Response, Request, HTTPException, Depends
 from app.schemas.common import SuccessMsg
 from app.schemas.post import PostBody, PostResponse, PaginatedPostsResponse
 from ..cruds.crud_post import (
-    db_get_single_post,
     db_delete_post_and_related_items,
 )
 from starlette.status import HTTP_201_CREATED
@@ -11,19 +10,36 @@ from typing import Optional
 from app.auth.auth_utils import AuthJwtCsrf
 from app.auth.cookie_utils import CookieManager
 from fastapi_csrf_protect import CsrfProtect
-import json
 from app.services.post_service import PostService
+from app.database import run_db
+from app.cursor import CursorKind, encode_cursor, decode_cursor
+from app.etag import build_weak_etag, is_not_modified, not_modified_response
+from app.responses import FastJSONResponse, prevalidated_items
 import logging
-from app.exceptions import PostOwnershipError, UserPermissionError
+from app.exceptions import UserPermissionError
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 auth = AuthJwtCsrf()
 cookie_manager = CookieManager()
 
+_POST_FIELDS = tuple(PostResponse.model_fields)
+
+
+def _posts_page_response(result: dict) -> FastJSONResponse:
+    """一覧はCRUD層で組み立て済みなので、response_modelの再検証を通さずに返す"""
+    return FastJSONResponse(
+        {
+            "posts": prevalidated_items(
+                result["posts"], _POST_FIELDS, ("created_at", "updated_at")
+            ),
+            "last_evaluated_key": result["last_evaluated_key"],
+        }
+    )
+
 
 @router.post("/api/posts", response_model=PostResponse)
-def create_post(
+async def create_post(
     request: Request,
     response: Response,
     data: PostBody,
@@ -35,164 +51,205 @@ def create_post(
         request, csrf_protect, request.headers
     )
 
-    logger.info(f"[ROUTE] Authentication successful for user: {username}")
+    logger.info("[ROUTE] Authentication successful for user: %s", username)
 
-    res = PostService.create_post_with_like_info(username, data)
+    res = await run_db(PostService.create_post_with_like_info, username, data)
 
     response.status_code = HTTP_201_CREATED
     cookie_manager.set_jwt_cookie(response, new_token)
 
-    logger.info(f"[ROUTE] POST /api/posts completed successfully for user: {username}")
+    logger.info("[ROUTE] POST /api/posts completed successfully for user: %s", username)
 
     return res
 
 
 # ログインしなくても見れるようにするので、JWT認証は必要なし
 @router.get("/api/posts", response_model=PaginatedPostsResponse)
-def get_posts_paginated(
+async def get_posts_paginated(
     request: Request,
     limit: int = Query(10, ge=1, le=50),
     last_evaluated_key: Optional[str] = None,
 ):
-    logger.info(f"[ROUTE] GET /api/posts called: limit={limit}")
+    logger.info("[ROUTE] GET /api/posts called: limit=%s", limit)
 
     username = auth.get_current_user_optional(request)
 
-    lek = json.loads(last_evaluated_key) if last_evaluated_key else None
-    result = PostService.get_posts_with_like_info(
-        limit=limit, last_evaluated_key=lek, username=username
+    lek = (
+        decode_cursor(CursorKind.POSTS, "", last_evaluated_key)
+        if last_evaluated_key
+        else None
     )
-    # last_evaluated_keyを文字列化、フロントでなくサーバー側で処理
+    result = await run_db(
+        PostService.get_posts_with_like_info,
+        limit=limit,
+        last_evaluated_key=lek,
+        username=username,
+    )
+    # last_evaluated_keyを署名付きカーソルに変換、フロントでなくサーバー側で処理
     if result["last_evaluated_key"]:
-        result["last_evaluated_key"] = json.dumps(result["last_evaluated_key"])
+        result["last_evaluated_key"] = encode_cursor(
+            CursorKind.POSTS, "", result["last_evaluated_key"]
+        )
 
-    logger.info(f"[ROUTE] GET /api/posts completed: count={len(result['posts'])}")
+    logger.info("[ROUTE] GET /api/posts completed: count=%s", len(result["posts"]))
 
-    return result
+    return _posts_page_response(result)
 
 
 # ログインしなくても見れるようにするので、JWT認証は必要なし
 @router.get("/api/posts/category/{category}", response_model=PaginatedPostsResponse)
-def get_posts_by_category_paginated(
+async def get_posts_by_category_paginated(
     request: Request,
     category: str,
     limit: int = Query(10, ge=1, le=50),
     last_evaluated_key: Optional[str] = None,
 ):
     logger.info(
-        f"[ROUTE] Getting posts by category: category={category}, limit={limit}, has_last_key={last_evaluated_key is not None}"
+        "[ROUTE] Getting posts by category: category=%s, limit=%s, has_last_key=%s",
+        category,
+        limit,
+        last_evaluated_key is not None,
     )
 
     username = auth.get_current_user_optional(request)
-    logger.debug(f"[ROUTE] User authentication status: username={username}")
+    logger.debug("[ROUTE] User authentication status: username=%s", username)
 
-    lek = json.loads(last_evaluated_key) if last_evaluated_key else None
-    result = PostService.get_posts_by_category_with_like_info(
-        category, limit=limit, last_evaluated_key=lek, username=username
+    lek = (
+        decode_cursor(CursorKind.CATEGORY_POSTS, category, last_evaluated_key)
+        if last_evaluated_key
+        else None
+    )
+    result = await run_db(
+        PostService.get_posts_by_category_with_like_info,
+        category,
+        limit=limit,
+        last_evaluated_key=lek,
+        username=username,
     )
-    # last_evaluated_keyを文字列化、フロントでなくサーバー側で処理
+    # last_evaluated_keyを署名付きカーソルに変換、フロントでなくサーバー側で処理
     if result["last_evaluated_key"]:
-        result["last_evaluated_key"] = json.dumps(result["last_evaluated_key"])
+        result["last_evaluated_key"] = encode_cursor(
+            CursorKind.CATEGORY_POSTS, category, result["last_evaluated_key"]
+        )
 
     logger.info(
-        f"[ROUTE] Posts by category retrieved successfully: category={category}, count={len(result.get('posts', []))}"
+        "[ROUTE] Posts by category retrieved successfully: category=%s, count=%s",
+        category,
+        len(result.get("posts", [])),
+    )
+    return _posts_page_response(result)
+
+
+def _single_post_etag(post_id: str, username: Optional[str], post: dict) -> str:
+    """投稿詳細のETag（is_likedは閲覧ユーザーごとに異なるので、ユーザー名も含める）"""
+    return build_weak_etag(
+        "post",
+        post_id,
+        post["updated_at"],
+        post["like_count"],
+        post["comment_count"],
+        username or "",
+        post["is_liked"],
     )
-    return result
 
 
 # ログインしなくても見れるようにするので、JWT認証は必要なし
 @router.get("/api/posts/{post_id}", response_model=PostResponse)
-def get_single_post(request: Request, post_id: str):
-    logger.info(f"[ROUTE] Getting single post: post_id={post_id}")
+async def get_single_post(request: Request, response: Response, post_id: str):
+    logger.info("[ROUTE] Getting single post: post_id=%s", post_id)
 
     # ログイン中ならusernameを取得する
     username = auth.get_current_user_optional(request)
-    logger.debug(f"[ROUTE] User authentication status: username={username}")
+    logger.debug("[ROUTE] User authentication status: username=%s", username)
+
+    is_liked = None
+    if request.headers.get("if-none-match"):
+        # 条件付きリクエストは、ETagを決める属性だけを射影で読んで先に判定する
+        version = await run_db(PostService.get_single_post_version, post_id, username)
+        etag = _single_post_etag(post_id, username, version)
+        if is_not_modified(request, etag):
+            logger.info("[ROUTE] Single post not modified: post_id=%s", post_id)
+            return not_modified_response(etag, vary="Cookie")
+        is_liked = version["is_liked"]
+
+    # 本文を含む全体の読み取りは、304で返せなかった場合だけ行う
+    result = await run_db(
+        PostService.get_single_post_with_like_info, post_id, username, is_liked
+    )
+    etag = _single_post_etag(post_id, username, result)
+    response.headers["ETag"] = etag
+    response.headers["Vary"] = "Cookie"
 
-    result = PostService.get_single_post_with_like_info(post_id, username)
-    logger.info(f"[ROUTE] Single post retrieved successfully: post_id={post_id}")
+    logger.info("[ROUTE] Single post retrieved successfully: post_id=%s", post_id)
     return result
 
 
 @router.put("/api/posts/{post_id}", response_model=PostResponse)
-def update_post(
+async def update_post(
     request: Request,
     response: Response,
     post_id: str,
     data: PostBody,
     csrf_protect: CsrfProtect = Depends(),
 ):
-    logger.info(f"[ROUTE] Updating post: post_id={post_id}")
+    logger.info("[ROUTE] Updating post: post_id=%s", post_id)
 
     # 認証
     new_token, username = auth.verify_csrf_update_jwt(
         request, csrf_protect, request.headers
     )
 
-    # 認可: 投稿の所有者であることの確認
-    post = db_get_single_post(post_id)
-    if post["username"] != username:
-        logger.warning(
-            f"[ROUTE] Unauthorized post update attempt: post_id={post_id}, username={username}"
-        )
-        raise PostOwnershipError(message="この投稿を更新する権限がありません。")
-
-    result = PostService.update_post_with_like_info(post_id, data, username)
+    # 認可: 所有者の確認は更新の条件式で行う（PostOwnershipError）
+    result = await run_db(
+        PostService.update_post_with_like_info, post_id, data, username
+    )
     cookie_manager.set_jwt_cookie(response, new_token)
 
-    logger.info(f"[ROUTE] Post updated successfully: post_id={post_id}")
+    logger.info("[ROUTE] Post updated successfully: post_id=%s", post_id)
     return result
 
 
 # 特定のpost_idのpostを削除し、それについているcommmentもすべて削除する
 # 削除権限のあるユーザーか、認可が必要 new_token, subject =で取得
 @router.delete("/api/posts/{post_id}", response_model=SuccessMsg)
-def delete_post(
+async def delete_post(
     request: Request,
     response: Response,
     post_id: str,
     csrf_protect: CsrfProtect = Depends(),
 ):
-    logger.info(f"[ROUTE] Deleting post: post_id={post_id}")
+    logger.info("[ROUTE] Deleting post: post_id=%s", post_id)
 
     # 認証
     new_token, username = auth.verify_csrf_update_jwt(
         request, csrf_protect, request.headers
     )
-    logger.debug(f"[ROUTE] User authenticated for post deletion: username={username}")
-
-    # 認可: 投稿の所有者であることの確認
-    post = db_get_single_post(post_id)
-
-    if post["username"] != username:
-        logger.warning(
-            f"[ROUTE] Unauthorized post deletion attempt: post_id={post_id}, username={username}, owner={post['username']}"
-        )
-        raise PostOwnershipError(message="この投稿を削除する権限がありません。")
-
-    logger.info(
-        f"[ROUTE] Authorization verified for post deletion: post_id={post_id}, username={username}"
-    )
+    logger.debug("[ROUTE] User authenticated for post deletion: username=%s", username)
 
-    result = db_delete_post_and_related_items(post_id)
+    # 認可: 所有者の確認は削除の条件式で行う（PostOwnershipError）
+    # 削除しきれなかったコメント・いいねは削除待ちとして記録され、定期ジョブが削除する
+    await run_db(db_delete_post_and_related_items, post_id, username)
     cookie_manager.set_jwt_cookie(response, new_token)
 
     logger.info(
-        f"[ROUTE] Post deleted successfully: post_id={post_id}, username={username}"
+        "[ROUTE] Post deleted successfully: post_id=%s, username=%s", post_id, username
     )
     return {"message": f"Post {post_id} deleted successfully."}
 
 
 # ログインが必要=JWT認証が必要
 @router.get("/api/users/{username}/posts", response_model=PaginatedPostsResponse)
-def get_posts_by_user_paginated(
+async def get_posts_by_user_paginated(
     request: Request,
     username: str,
     limit: int = Query(10, ge=1, le=50),
     last_evaluated_key: Optional[str] = None,
 ):
     logger.info(
-        f"[ROUTE] Getting posts by user: username={username}, limit={limit}, has_last_key={last_evaluated_key is not None}"
+        "[ROUTE] Getting posts by user: username=%s, limit=%s, has_last_key=%s",
+        username,
+        limit,
+        last_evaluated_key is not None,
     )
 
     token_username = auth.verify_jwt(request)
@@ -205,28 +262,39 @@ def get_posts_by_user_paginated(
         raise UserPermissionError(message="自分の投稿のみ閲覧できます。")
 
     logger.info(
-        f"[ROUTE] Authorization verified for user posts access: username={username}"
+        "[ROUTE] Authorization verified for user posts access: username=%s", username
     )
 
-    lek = json.loads(last_evaluated_key) if last_evaluated_key else None
+    lek = (
+        decode_cursor(CursorKind.USER_POSTS, username, last_evaluated_key)
+        if last_evaluated_key
+        else None
+    )
 
-    result = PostService.get_posts_by_user_with_like_info(
-        limit=limit, last_evaluated_key=lek, username=username
+    result = await run_db(
+        PostService.get_posts_by_user_with_like_info,
+        limit=limit,
+        last_evaluated_key=lek,
+        username=username,
     )
 
-    # last_evaluated_keyを文字列化、フロントでなくサーバー側で処理
+    # last_evaluated_keyを署名付きカーソルに変換、フロントでなくサーバー側で処理
     if result["last_evaluated_key"]:
-        result["last_evaluated_key"] = json.dumps(result["last_evaluated_key"])
+        result["last_evaluated_key"] = encode_cursor(
+            CursorKind.USER_POSTS, username, result["last_evaluated_key"]
+        )
 
     logger.info(
-        f"[ROUTE] User posts retrieved successfully: username={username}, count={len(result.get('posts', []))}"
+        "[ROUTE] User posts retrieved successfully: username=%s, count=%s",
+        username,
+        len(result.get("posts", [])),
     )
-    return result
+    return _posts_page_response(result)
 
 
 # 無限スクロール対応版（オプション）
 @router.get("/api/users/{username}/liked-posts", response_model=PaginatedPostsResponse)
-def get_user_liked_posts_paginated(
+async def get_user_liked_posts_paginated(
     request: Request,
     username: str,
     limit: int = Query(10, ge=1, le=50),
@@ -234,7 +302,10 @@ def get_user_liked_posts_paginated(
 ):
     """ユーザーがいいねした投稿一覧を取得（ページネーション対応）"""
     logger.info(
-        f"[ROUTE] Getting user liked posts: username={username}, limit={limit}, has_last_key={last_evaluated_key is not None}"
+        "[ROUTE] Getting user liked posts: username=%s, limit=%s, has_last_key=%s",
+        username,
+        limit,
+        last_evaluated_key is not None,
     )
 
     token_username = auth.verify_jwt(request)
@@ -245,20 +316,31 @@ def get_user_liked_posts_paginated(
         )
         raise UserPermissionError(message="自分のいいね投稿のみ閲覧できます。")
 
-    logger.debug(f"[ROUTE] User authenticated: token_username={token_username}")
+    logger.debug("[ROUTE] User authenticated: token_username=%s", token_username)
 
-    # last_evaluated_keyをparseする
-    lek = json.loads(last_evaluated_key) if last_evaluated_key else None
+    # カーソルを検証してlast_evaluated_keyに戻す（不正ならDBアクセス前に400）
+    lek = (
+        decode_cursor(CursorKind.USER_LIKES, username, last_evaluated_key)
+        if last_evaluated_key
+        else None
+    )
 
-    result = PostService.get_user_liked_posts_with_like_info(
-        username=username, limit=limit, last_evaluated_key=lek
+    result = await run_db(
+        PostService.get_user_liked_posts_with_like_info,
+        username=username,
+        limit=limit,
+        last_evaluated_key=lek,
     )
 
-    # last_evaluated_keyを文字列化、フロントでなくサーバー側で処理
+    # last_evaluated_keyを署名付きカーソルに変換、フロントでなくサーバー側で処理
     if result["last_evaluated_key"]:
-        result["last_evaluated_key"] = json.dumps(result["last_evaluated_key"])
+        result["last_evaluated_key"] = encode_cursor(
+            CursorKind.USER_LIKES, username, result["last_evaluated_key"]
+        )
 
     logger.info(
-        f"[ROUTE] User liked posts retrieved successfully: username={username}, count={len(result.get('posts', []))}"
+        "[ROUTE] User liked posts retrieved successfully: username=%s, count=%s",
+        username,
+        len(result.get("posts", [])),
     )
-    return result
+    return _posts_page_response(result)
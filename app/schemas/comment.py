@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Optional, List
 
 
 class CommentBody(BaseModel):
@@ -15,3 +16,8 @@ class CommentResponse(BaseModel):
     post_id: str
     content: str
     created_at: datetime
+
+
+class PaginatedCommentsResponse(BaseModel):
+    comments: List[CommentResponse]
+    last_evaluated_key: Optional[str]  # 署名付きカーソル文字列
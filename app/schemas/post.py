@@ -26,6 +26,7 @@ class PostResponse(PostBody):
     post_id: str
     username: str
     like_count: int
+    comment_count: int
     is_liked: bool
     created_at: datetime
     updated_at: datetime
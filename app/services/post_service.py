@@ -3,16 +3,20 @@ from app.cruds.crud_post import (
     db_get_posts,
     db_get_posts_by_category,
     db_get_single_post,
+    db_get_post_version,
     db_create_post,
     db_update_post,
     db_get_posts_by_user_paginated,
     db_get_user_liked_posts_paginated,
+    feed_cache,
 )
-from app.cruds.crud_like import db_get_like_count, db_get_like_status
+from app.cruds.crud_like import db_get_like_statuses, BATCH_GET_MAX_KEYS
 from app.exceptions import (
     PostRetrievalError,
     PostCreationError,
     PostUpdateError,
+    PostNotFoundError,
+    PostOwnershipError,
     DatabaseError,
     LikeRetrievalError,
 )
@@ -24,6 +28,52 @@ logger = logging.getLogger(__name__)
 
 # crud処理を利用したビジネスロジックを記載
 class PostService:
+    @staticmethod
+    def _add_like_status(posts: list[dict], username: Optional[str]) -> None:
+        """投稿一覧にログインユーザーのいいね状態をまとめて付与する（未ログインなら全てFalse）
+
+        呼び出し元はすでにrun_dbのスレッド上にいるので、別のスレッドプールには渡さず
+        BatchGetItemの上限ごとに順に取得する。失敗したチャンクだけ未いいね扱いにする。
+        """
+        post_ids = [post["post_id"] for post in posts]
+        statuses = {}
+        failed_post_ids = set()
+
+        if username:
+            for start in range(0, len(post_ids), BATCH_GET_MAX_KEYS):
+                chunk = post_ids[start : start + BATCH_GET_MAX_KEYS]
+                try:
+                    statuses.update(db_get_like_statuses(chunk, username))
+                except (LikeRetrievalError, DatabaseError) as e:
+                    # 再試行後のスロットリングなども、ページ全体は失敗させずに劣化させる
+                    logger.warning(
+                        f"[SERVICE] Failed to get like info for posts: count={len(chunk)}, error={e.message}"
+                    )
+                    failed_post_ids.update(chunk)
+
+        for post in posts:
+            if post["post_id"] in failed_post_ids:
+                # いいね状態だけ未いいね扱いにする（like_countはMETAから読んだ値のまま）
+                post["is_liked"] = False
+            else:
+                post["is_liked"] = statuses.get(post["post_id"], False)
+
+    @staticmethod
+    def _get_first_page(limit: int, category: Optional[str] = None) -> dict:
+        """全ユーザー共通の1ページ目をキャッシュから取得する（いいね状態は含まない）"""
+        if category is None:
+            loader = lambda: db_get_posts(limit=limit)
+        else:
+            loader = lambda: db_get_posts_by_category(category, limit=limit)
+
+        page = feed_cache.get_or_load((limit, category), loader)
+
+        # ユーザーごとのいいね状態を付与するため、キャッシュ本体はコピーして返す
+        return {
+            "posts": [dict(post) for post in page["posts"]],
+            "last_evaluated_key": page["last_evaluated_key"],
+        }
+
     @staticmethod
     def get_posts_with_like_info(
         limit: int = 10,
@@ -32,30 +82,22 @@ class PostService:
     ) -> list[dict]:
         """投稿一覧といいね情報を組み合わせて返す"""
         logger.info(
-            f"[SERVICE] Getting posts service: limit={limit}, username={username}"
+            "[SERVICE] Getting posts service: limit=%s, username=%s", limit, username
         )
 
         try:
-            result = db_get_posts(limit=limit, last_evaluated_key=last_evaluated_key)
+            if last_evaluated_key is None:
+                result = PostService._get_first_page(limit)
+            else:
+                result = db_get_posts(
+                    limit=limit, last_evaluated_key=last_evaluated_key
+                )
 
-            # Postsすべてにいいね情報を追加
-            for post in result["posts"]:
-                try:
-                    post["like_count"] = db_get_like_count(post["post_id"])
-                    if username:
-                        post["is_liked"] = db_get_like_status(post["post_id"], username)
-                    else:
-                        post["is_liked"] = False
-                except LikeRetrievalError as e:
-                    logger.warning(
-                        f"[SERVICE] Failed to get like info for post {post['post_id']}: {e.message}"
-                    )
-                    # いいね情報取得失敗時はデフォルト値を設定
-                    post["like_count"] = 0
-                    post["is_liked"] = False
+            # いいね数は投稿METAから取得済みなので、いいね状態のみ一括で追加
+            PostService._add_like_status(result["posts"], username)
 
             logger.info(
-                f"[SERVICE] Posts service completed: count={len(result['posts'])}"
+                "[SERVICE] Posts service completed: count=%s", len(result["posts"])
             )
             return result
 
@@ -89,31 +131,27 @@ class PostService:
     ) -> list[dict]:
         """カテゴリ別の投稿一覧といいね情報を組み合わせて返す"""
         logger.info(
-            f"[SERVICE] Getting posts by category service: category={category}, limit={limit}, username={username}"
+            "[SERVICE] Getting posts by category service: category=%s, limit=%s, username=%s",
+            category,
+            limit,
+            username,
         )
 
         try:
-            posts_data = db_get_posts_by_category(
-                category, limit=limit, last_evaluated_key=last_evaluated_key
-            )
+            if last_evaluated_key is None:
+                posts_data = PostService._get_first_page(limit, category)
+            else:
+                posts_data = db_get_posts_by_category(
+                    category, limit=limit, last_evaluated_key=last_evaluated_key
+                )
 
-            # Postsすべてにいいね情報を追加
-            for post in posts_data["posts"]:
-                try:
-                    post["like_count"] = db_get_like_count(post["post_id"])
-                    if username:
-                        post["is_liked"] = db_get_like_status(post["post_id"], username)
-                    else:
-                        post["is_liked"] = False
-                except LikeRetrievalError as e:
-                    logger.warning(
-                        f"[SERVICE] Failed to get like info for post {post['post_id']}: {e.message}"
-                    )
-                    post["like_count"] = 0
-                    post["is_liked"] = False
+            # いいね数は投稿METAから取得済みなので、いいね状態のみ一括で追加
+            PostService._add_like_status(posts_data["posts"], username)
 
             logger.info(
-                f"[SERVICE] Posts by category service completed: category={category}, count={len(posts_data['posts'])}"
+                "[SERVICE] Posts by category service completed: category=%s, count=%s",
+                category,
+                len(posts_data["posts"]),
             )
             return posts_data
 
@@ -139,33 +177,55 @@ class PostService:
                 original_error=e,
             )
 
+    @staticmethod
+    def get_single_post_version(post_id: str, username: Optional[str] = None) -> dict:
+        """投稿詳細のETagを決める値（更新日時・件数・いいね状態）だけを取得する"""
+        logger.debug(
+            "[SERVICE] Getting single post version: post_id=%s, username=%s",
+            post_id,
+            username,
+        )
+        try:
+            version = db_get_post_version(post_id)
+            version["post_id"] = post_id
+            PostService._add_like_status([version], username)
+            return version
+
+        except (PostRetrievalError, PostNotFoundError, DatabaseError):
+            raise
+
+        except Exception as e:
+            logger.error(
+                f"[SERVICE] Unexpected error in get_single_post_version: post_id={post_id}, error_type={type(e).__name__}, error_message={str(e)}",
+                exc_info=True,
+            )
+            raise PostRetrievalError(
+                message="投稿詳細取得サービスで予期しないエラーが発生しました。",
+                original_error=e,
+            )
+
     @staticmethod
     # 投稿詳細データにいいね情報を含める
     def get_single_post_with_like_info(
-        post_id: str, username: Optional[str] = None
+        post_id: str, username: Optional[str] = None, is_liked: Optional[bool] = None
     ) -> dict:
         logger.info(
-            f"[SERVICE] Getting single post service: post_id={post_id}, username={username}"
+            "[SERVICE] Getting single post service: post_id=%s, username=%s",
+            post_id,
+            username,
         )
         try:
             single_post_data = db_get_single_post(post_id)
 
             # 投稿詳細データがあるならば、いいね情報を追加する
-            try:
-                single_post_data["like_count"] = db_get_like_count(post_id)
-                # ログイン中なら個人のいいね状態、未ログインならFalse
-                if username:
-                    single_post_data["is_liked"] = db_get_like_status(post_id, username)
-                else:
-                    single_post_data["is_liked"] = False
-            except LikeRetrievalError as e:
-                logger.warning(
-                    f"[SERVICE] Failed to get like info for post {post_id}: {e.message}"
-                )
-                single_post_data["like_count"] = 0
-                single_post_data["is_liked"] = False
-
-            logger.info(f"[SERVICE] Single post service completed: post_id={post_id}")
+            # ログイン中なら個人のいいね状態、未ログインならFalse
+            # ETag判定で取得済みのいいね状態が渡された場合は読み直さない
+            if is_liked is None:
+                PostService._add_like_status([single_post_data], username)
+            else:
+                single_post_data["is_liked"] = is_liked
+
+            logger.info("[SERVICE] Single post service completed: post_id=%s", post_id)
             return single_post_data
 
         except PostRetrievalError:
@@ -193,7 +253,7 @@ class PostService:
     @staticmethod
     def create_post_with_like_info(username: str, post_data: dict) -> dict:
         """投稿を作成し、いいね情報を含むレスポンスを返す"""
-        logger.info(f"[SERVICE] Starting post creation service for user: {username}")
+        logger.info("[SERVICE] Starting post creation service for user: %s", username)
 
         try:
             post_result = db_create_post(username, post_data)
@@ -201,27 +261,17 @@ class PostService:
             post_id = post_result["post_id"]
 
             logger.info(
-                f"[SERVICE] Post creation service completed successfully: username={username}, post_id={post_id}"
+                "[SERVICE] Post creation service completed successfully: username=%s, post_id=%s",
+                username,
+                post_id,
             )
-            # いいね情報を追加
-            try:
-                like_count = db_get_like_count(post_id)
-                is_liked = db_get_like_status(post_id, username)
-            except LikeRetrievalError as e:
-                logger.warning(
-                    f"[SERVICE] Failed to get like info for new post {post_id}: {e.message}"
-                )
-                like_count = 0
-                is_liked = False
-
-            result = {
-                **post_result,
-                "like_count": like_count,
-                "is_liked": is_liked,
-            }
+            # 作成直後の投稿はいいねされていないので、いいね状態の取得は不要
+            result = {**post_result, "is_liked": False}
 
             logger.info(
-                f"[SERVICE] Post creation service completed successfully: username={username}, post_id={post_id}"
+                "[SERVICE] Post creation service completed successfully: username=%s, post_id=%s",
+                username,
+                post_id,
             )
             return result
 
@@ -243,34 +293,22 @@ class PostService:
 
     @staticmethod
     def update_post_with_like_info(post_id: str, data: dict, username: str) -> dict:
-        """投稿を作成し、いいね情報を含むレスポンスを返す"""
+        """投稿を更新し、いいね情報を含むレスポンスを返す"""
         logger.info(
-            f"[SERVICE] Starting post update service: post_id={post_id}, username={username}"
+            "[SERVICE] Starting post update service: post_id=%s, username=%s",
+            post_id,
+            username,
         )
         try:
-            # 投稿作成
-            post_result = db_update_post(post_id, data)
+            post_result = db_update_post(post_id, data, username)
 
             post_id = post_result["post_id"]
 
             # いいね情報を追加
-            try:
-                like_count = db_get_like_count(post_id)
-                is_liked = db_get_like_status(post_id, username)
-            except LikeRetrievalError as e:
-                logger.warning(
-                    f"[SERVICE] Failed to get like info for updated post {post_id}: {e.message}"
-                )
-                like_count = 0
-                is_liked = False
+            result = {**post_result}
+            PostService._add_like_status([result], username)
 
-            result = {
-                **post_result,
-                "like_count": like_count,
-                "is_liked": is_liked,
-            }
-
-            logger.info(f"[SERVICE] Post update service completed: post_id={post_id}")
+            logger.info("[SERVICE] Post update service completed: post_id=%s", post_id)
             return result
 
         except PostUpdateError:
@@ -279,6 +317,10 @@ class PostService:
             )
             raise
 
+        except (PostNotFoundError, PostOwnershipError):
+            # 存在しない・所有者でない投稿はそのままルートのエラーハンドラーへ
+            raise
+
         except DatabaseError:
             logger.error(
                 f"[SERVICE] Database error in update_post_with_like_info: post_id={post_id}"
@@ -304,27 +346,22 @@ class PostService:
     ) -> dict:
         """ユーザーの投稿一覧といいね情報を組み合わせて返す"""
         logger.info(
-            f"[SERVICE] Getting posts by user service: username={username}, limit={limit}"
+            "[SERVICE] Getting posts by user service: username=%s, limit=%s",
+            username,
+            limit,
         )
         try:
             posts_data = db_get_posts_by_user_paginated(
                 username=username, limit=limit, last_evaluated_key=last_evaluated_key
             )
 
-            # Postsすべてにいいね情報を追加
-            for post in posts_data["posts"]:
-                try:
-                    post["like_count"] = db_get_like_count(post["post_id"])
-                    post["is_liked"] = db_get_like_status(post["post_id"], username)
-                except LikeRetrievalError as e:
-                    logger.warning(
-                        f"[SERVICE] Failed to get like info for post {post['post_id']}: {e.message}"
-                    )
-                    post["like_count"] = 0
-                    post["is_liked"] = False
+            # いいね数は投稿METAから取得済みなので、いいね状態のみ一括で追加
+            PostService._add_like_status(posts_data["posts"], username)
 
             logger.info(
-                f"[SERVICE] Posts by user service completed: username={username}, count={len(posts_data['posts'])}"
+                "[SERVICE] Posts by user service completed: username=%s, count=%s",
+                username,
+                len(posts_data["posts"]),
             )
             return posts_data
 
@@ -359,7 +396,9 @@ class PostService:
     ) -> dict:
         """ユーザーの投稿一覧といいね情報を組み合わせて返す"""
         logger.info(
-            f"[SERVICE] Getting user liked posts service: username={username}, limit={limit}"
+            "[SERVICE] Getting user liked posts service: username=%s, limit=%s",
+            username,
+            limit,
         )
 
         try:
@@ -367,20 +406,13 @@ class PostService:
                 username=username, limit=limit, last_evaluated_key=last_evaluated_key
             )
 
-            # Postsすべてにいいね情報を追加
-            for post in posts_data["posts"]:
-                try:
-                    post["like_count"] = db_get_like_count(post["post_id"])
-                    post["is_liked"] = db_get_like_status(post["post_id"], username)
-                except LikeRetrievalError as e:
-                    logger.warning(
-                        f"[SERVICE] Failed to get like info for post {post['post_id']}: {e.message}"
-                    )
-                    post["like_count"] = 0
-                    post["is_liked"] = False
+            # いいね数は投稿METAから取得済みなので、いいね状態のみ一括で追加
+            PostService._add_like_status(posts_data["posts"], username)
 
             logger.info(
-                f"[SERVICE] User liked posts service completed: username={username}, count={len(posts_data['posts'])}"
+                "[SERVICE] User liked posts service completed: username=%s, count=%s",
+                username,
+                len(posts_data["posts"]),
             )
             return posts_data
 
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+app.main:handler のコールドインポート時間を計測するスクリプト
+
+新しいPythonプロセスで毎回importし直すので、Lambdaのコールドスタートに近い値になる。
+-X importtime の出力から、時間のかかっているトップレベルのモジュールも表示する。
+
+使用方法:
+  python scripts/bench_cold_start.py [--runs 10] [--top 15] [--max-ms 800]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# import時に必須の設定（未設定ならダミー値で計測する）
+DEFAULT_ENV = {
+    "JWT_KEY": "bench-jwt-key",
+    "CSRF_KEY": "bench-csrf-key",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "15",
+    "IS_LOCAL": "true",
+}
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+from app.main import handler
+print(f"{(time.perf_counter() - start) * 1000:.3f}")
+"""
+
+
+def run_once() -> tuple[float, dict[str, int]]:
+    """1回分のコールドインポートを計測し、(合計ms, トップレベルモジュールごとのμs)を返す"""
+    env = {**DEFAULT_ENV, **os.environ}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # 形式: "import time:   self [us] |  cumulative | imported package"
+    # インデントなしの行がトップレベルのimport（cumulativeに子も含む）
+    breakdown: dict[str, int] = defaultdict(int)
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|", 2)
+        if name.startswith("  "):
+            continue
+        breakdown[name.strip().split(".")[0]] += int(cumulative)
+
+    total_ms = float(completed.stdout.strip().splitlines()[-1])
+    return total_ms, breakdown
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="app.main:handler のコールドインポート計測"
+    )
+    parser.add_argument("--runs", type=int, default=10, help="計測回数")
+    parser.add_argument("--top", type=int, default=15, help="表示するモジュール数")
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="中央値がこの値を超えたら終了コード1（CIでの回帰検知用）",
+    )
+    args = parser.parse_args()
+
+    totals = []
+    breakdowns: dict[str, list[int]] = defaultdict(list)
+    for _ in range(args.runs):
+        total_ms, breakdown = run_once()
+        totals.append(total_ms)
+        for name, micros in breakdown.items():
+            breakdowns[name].append(micros)
+
+    median_ms = statistics.median(totals)
+    print(f"🚀 app.main:handler コールドインポート（{args.runs}回）")
+    print(
+        f"  median={median_ms:.1f}ms  min={min(totals):.1f}ms  max={max(totals):.1f}ms"
+    )
+    print()
+    print(f"📦 トップレベルモジュール別（cumulative中央値、上位{args.top}件）")
+    ranked = sorted(
+        ((statistics.median(values), name) for name, values in breakdowns.items()),
+        reverse=True,
+    )
+    for micros, name in ranked[: args.top]:
+        print(f"  {micros / 1000:8.1f}ms  {name}")
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f"❌ 中央値 {median_ms:.1f}ms が上限 {args.max_ms:.1f}ms を超えました")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@
 """
 
 import boto3
+from boto3.dynamodb.conditions import Key, Attr
+import os
 import uuid
 import hashlib
 from datetime import datetime, timedelta, timezone
@@ -1419,6 +1421,8 @@ def create_sample_posts(table):
                 "recommend3": post_data["recommend3"],
                 "created_at": now,
                 "updated_at": now,
+                "like_count": 0,  # いいね数（いいね作成時に加算）
+                "comment_count": 0,  # コメント数（コメント作成時に加算）
                 # GSI1: 全投稿一覧
                 "GSI1_PK": "POST#ALL",
                 "GSI1_SK": f"{now}#{post_id}",
@@ -1487,6 +1491,12 @@ def create_sample_likes(table, posts_created):
                     Item=item,
                     ConditionExpression="attribute_not_exists(PK) AND attribute_not_exists(SK)",
                 )
+                # 投稿METAのいいね数を加算
+                table.update_item(
+                    Key={"PK": f"POST#{post_id}", "SK": "META"},
+                    UpdateExpression="ADD like_count :inc",
+                    ExpressionAttributeValues={":inc": 1},
+                )
                 likes_created += 1
                 print(f"  ✅ いいね: @{liker} → {post['title'][:20]}...")
 
@@ -1556,6 +1566,146 @@ def show_summary(table):
         print("💡 AWS Consoleで直接確認してください")
 
 
+def _backfill_counts(table, sk_prefix: str, attribute: str, label: str):
+    """既存投稿のMETAに、関連アイテム（SKがsk_prefixで始まる）の件数を書き込む"""
+    print(f"🔁 {label}の移行を開始します...")
+
+    updated = 0
+    scan_params = {
+        "FilterExpression": Attr("PK").begins_with("POST#") & Attr("SK").eq("META"),
+        "ProjectionExpression": "PK",
+    }
+
+    # 1MBごとに分割されるのでLastEvaluatedKeyがなくなるまで走査
+    while True:
+        response = table.scan(**scan_params)
+
+        for post in response.get("Items", []):
+            count = 0
+            query_params = {
+                "KeyConditionExpression": Key("PK").eq(post["PK"])
+                & Key("SK").begins_with(sk_prefix),
+                "Select": "COUNT",
+            }
+            while True:
+                count_response = table.query(**query_params)
+                count += count_response.get("Count", 0)
+                if "LastEvaluatedKey" not in count_response:
+                    break
+                query_params["ExclusiveStartKey"] = count_response["LastEvaluatedKey"]
+
+            table.update_item(
+                Key={"PK": post["PK"], "SK": "META"},
+                UpdateExpression=f"SET {attribute} = :count",
+                ExpressionAttributeValues={":count": count},
+            )
+            updated += 1
+            print(f"  ✅ {post['PK']}: {attribute}={count}")
+
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    print(f"🎉 {label}の移行完了: {updated}件")
+
+
+def backfill_like_counts(table):
+    """既存投稿のMETAにいいね数（like_count）を書き込む移行処理"""
+    _backfill_counts(table, "LIKE#", "like_count", "いいね数")
+
+
+def backfill_comment_counts(table):
+    """既存投稿のMETAにコメント数（comment_count）を書き込む移行処理"""
+    _backfill_counts(table, "COMMENT#", "comment_count", "コメント数")
+
+
+def migrate_categories(table):
+    """旧形式（CATEGORY#<id> / META）のカテゴリをCATEGORY#ALLパーティションへ移行"""
+    print("🔁 カテゴリの移行を開始します...")
+
+    old_items = []
+    scan_params = {
+        "FilterExpression": Attr("PK").begins_with("CATEGORY#")
+        & Attr("PK").ne("CATEGORY#ALL")
+        & Attr("SK").eq("META"),
+    }
+
+    # 1MBごとに分割されるのでLastEvaluatedKeyがなくなるまで走査
+    while True:
+        response = table.scan(**scan_params)
+        old_items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    # 新形式を書き込んでから旧形式を削除する
+    with table.batch_writer() as batch:
+        for item in old_items:
+            category_id = item["PK"].split("#", 1)[1]
+            new_item = {
+                key: value for key, value in item.items() if key not in ("PK", "SK")
+            }
+            new_item["PK"] = "CATEGORY#ALL"
+            new_item["SK"] = f"CATEGORY#{category_id}"
+            batch.put_item(Item=new_item)
+            print(f"  ✅ {item['PK']} → CATEGORY#ALL / CATEGORY#{category_id}")
+
+    with table.batch_writer() as batch:
+        for item in old_items:
+            batch.delete_item(Key={"PK": item["PK"], "SK": item["SK"]})
+
+    print(f"🎉 カテゴリの移行完了: {len(old_items)}件")
+
+
+def _comment_id_from_time(created_at: datetime) -> str:
+    """作成時刻からUUIDv7を生成（app/cruds/crud_comment.pyと同じ形式）"""
+    value = (int(created_at.timestamp() * 1000) & ((1 << 48) - 1)) << 80
+    value |= int.from_bytes(os.urandom(10), "big") & ((1 << 80) - 1)
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return str(uuid.UUID(int=value))
+
+
+def migrate_comment_ids(table):
+    """UUIDv4のコメントIDを作成時刻順に並ぶUUIDv7へ振り直す（新しい順のページング用）"""
+    print("🔁 コメントIDの移行を開始します...")
+
+    old_items = []
+    scan_params = {
+        "FilterExpression": Attr("PK").begins_with("POST#")
+        & Attr("SK").begins_with("COMMENT#"),
+    }
+
+    while True:
+        response = table.scan(**scan_params)
+        for item in response.get("Items", []):
+            try:
+                if uuid.UUID(item["comment_id"]).version == 7:
+                    continue
+            except ValueError:
+                pass
+            old_items.append(item)
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    # 新しいIDで書き込んでから旧アイテムを削除する
+    with table.batch_writer() as batch:
+        for item in old_items:
+            new_id = _comment_id_from_time(datetime.fromisoformat(item["created_at"]))
+            new_item = dict(item)
+            new_item["SK"] = f"COMMENT#{new_id}"
+            new_item["comment_id"] = new_id
+            batch.put_item(Item=new_item)
+            print(f"  ✅ {item['PK']} {item['SK']} → COMMENT#{new_id}")
+
+    with table.batch_writer() as batch:
+        for item in old_items:
+            batch.delete_item(Key={"PK": item["PK"], "SK": item["SK"]})
+
+    print(f"🎉 コメントIDの移行完了: {len(old_items)}件")
+
+
 def show_help():
     """ヘルプ表示"""
     help_text = """
@@ -1569,8 +1719,12 @@ def show_help():
   python scripts/insert_dummy_data.py [オプション]
 
 オプション:
-  (なし)     ダミーデータ挿入実行
-  --help     このヘルプを表示
+  (なし)                   ダミーデータ挿入実行
+  --backfill-like-counts   既存投稿にいいね数（like_count）を移行
+  --backfill-comment-counts  既存投稿にコメント数（comment_count）を移行
+  --migrate-categories     カテゴリをCATEGORY#ALLパーティションへ移行
+  --migrate-comment-ids    コメントIDを作成時刻順のUUIDv7へ移行
+  --help                   このヘルプを表示
 
 認証設定例:
   aws configure
@@ -1595,6 +1749,24 @@ def main():
         show_help()
         return
 
+    # 移行処理のみ実行
+    migrations = {
+        "--backfill-like-counts": backfill_like_counts,
+        "--backfill-comment-counts": backfill_comment_counts,
+        "--migrate-categories": migrate_categories,
+        "--migrate-comment-ids": migrate_comment_ids,
+    }
+    if len(sys.argv) > 1 and sys.argv[1] in migrations:
+        if not check_aws_connection():
+            return
+        table = check_table_exists()
+        if not table:
+            return
+        if not confirm_production_execution():
+            return
+        migrations[sys.argv[1]](table)
+        return
+
     print("🚀 AWS本番DynamoDB ダミーデータ挿入スクリプト")
     print("=" * 60)
 
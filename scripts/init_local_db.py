@@ -333,6 +333,8 @@ def create_sample_posts():
                 "recommend3": post_data["recommend3"],
                 "created_at": now,
                 "updated_at": now,
+                "like_count": 0,  # いいね数（いいね作成時に加算）
+                "comment_count": 0,  # コメント数（コメント作成時に加算）
                 # GSI1: 全投稿一覧
                 "GSI1_PK": "POST#ALL",
                 "GSI1_SK": f"{now}#{post_id}",
@@ -403,6 +405,12 @@ def create_sample_likes(posts_created):
                     Item=item,
                     ConditionExpression="attribute_not_exists(PK) AND attribute_not_exists(SK)",
                 )
+                # 投稿METAのいいね数を加算
+                table.update_item(
+                    Key={"PK": f"POST#{post_id}", "SK": "META"},
+                    UpdateExpression="ADD like_count :inc",
+                    ExpressionAttributeValues={":inc": 1},
+                )
                 likes_created += 1
                 print(f"  ✅ いいね: @{liker} → {post['title'][:20]}...")
 
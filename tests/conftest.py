@@ -0,0 +1,17 @@
+import os
+
+# app.* のimport時に必須の設定（テスト用のダミー値）
+os.environ.setdefault("JWT_KEY", "test-jwt-key")
+os.environ.setdefault("CSRF_KEY", "test-csrf-key")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "15")
+os.environ.setdefault("IS_LOCAL", "true")
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+
+    return TestClient(app, raise_server_exceptions=False)
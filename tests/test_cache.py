@@ -0,0 +1,43 @@
+from app.cache import TTLCache
+
+
+def test_invalidation_during_load_discards_loaded_value():
+    cache = TTLCache("test_invalidate_during_load", ttl=60)
+
+    def stale_loader():
+        # 読み込み中に書き込み→破棄が起きた
+        cache.invalidate("feed")
+        return "stale"
+
+    assert cache.get_or_load("feed", stale_loader) == "stale"
+    assert cache.get_or_load("feed", lambda: "fresh") == "fresh"
+    assert cache.get_or_load("feed", lambda: "unused") == "fresh"
+
+
+def test_invalidate_matching_during_load_discards_loaded_value():
+    cache = TTLCache("test_invalidate_matching_during_load", ttl=60)
+
+    def stale_loader():
+        cache.invalidate_matching(lambda key, value: value == "other")
+        return "stale"
+
+    cache.get_or_load("feed", stale_loader)
+
+    assert cache.get_or_load("feed", lambda: "fresh") == "fresh"
+
+
+def test_key_load_state_is_dropped_after_loads_and_evictions():
+    cache = TTLCache("test_key_load_state_is_dropped", maxsize=2, ttl=60)
+
+    def invalidating_loader():
+        cache.invalidate()
+        return "stale"
+
+    cache.get_or_load("feed", invalidating_loader)
+    for i in range(100):
+        cache.get_or_load(i, lambda: i)
+    cache.invalidate(1)
+
+    # 読み込みが終わったキーのロックと世代番号は残らない
+    assert cache._loads == {}
+    assert cache.stats()["size"] == 2
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+import pytest
+from botocore.exceptions import ClientError
+import app.cruds.crud_post as crud_post
+from app.exceptions import PostNotFoundError, PostOwnershipError
+
+
+def _cancelled(meta_reason: dict) -> ClientError:
+    return ClientError(
+        {
+            "Error": {"Code": "TransactionCanceledException", "Message": "cancelled"},
+            "CancellationReasons": [meta_reason, {"Code": "None"}],
+        },
+        "TransactWriteItems",
+    )
+
+
+def _fake_table(transact_write_items, calls: list):
+    return SimpleNamespace(
+        table_name="MugenRecoTable",
+        meta=SimpleNamespace(
+            client=SimpleNamespace(transact_write_items=transact_write_items)
+        ),
+        query=lambda **kwargs: {"Items": []},
+        delete_item=lambda **kwargs: calls.append(("delete_item", kwargs)),
+        put_item=lambda **kwargs: calls.append(("put_item", kwargs)),
+    )
+
+
+def test_delete_post_writes_meta_delete_and_pending_marker_together(monkeypatch):
+    calls = []
+
+    def transact_write_items(TransactItems):
+        calls.append(("transact_write_items", TransactItems))
+
+    monkeypatch.setattr(crud_post, "table", _fake_table(transact_write_items, calls))
+
+    assert crud_post.db_delete_post_and_related_items("p1", "user1") is True
+
+    name, items = calls[0]
+    assert name == "transact_write_items"
+    assert items[0]["Delete"]["Key"] == {"PK": "POST#p1", "SK": "META"}
+    assert items[1]["Put"]["Item"]["PK"] == crud_post.PENDING_DELETIONS_PK
+    # パーティションを削除しきったので削除待ちを消す
+    assert calls[-1] == (
+        "delete_item",
+        {"Key": {"PK": crud_post.PENDING_DELETIONS_PK, "SK": "POST#p1"}},
+    )
+
+
+@pytest.mark.parametrize(
+    "meta_reason, expected",
+    [
+        (
+            {"Code": "ConditionalCheckFailed", "Item": {"PK": "POST#p1"}},
+            PostOwnershipError,
+        ),
+        ({"Code": "ConditionalCheckFailed"}, PostNotFoundError),
+    ],
+)
+def test_delete_post_maps_cancellation_reason(monkeypatch, meta_reason, expected):
+    def transact_write_items(TransactItems):
+        raise _cancelled(meta_reason)
+
+    monkeypatch.setattr(crud_post, "table", _fake_table(transact_write_items, []))
+
+    with pytest.raises(expected):
+        crud_post.db_delete_post_and_related_items("p1", "user2")
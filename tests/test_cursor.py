@@ -0,0 +1,21 @@
+import os
+import pytest
+from app import cursor
+from app.cursor import CursorKind, decode_cursor, encode_cursor
+from app.exceptions import InvalidCursorError
+
+
+def test_cursor_key_is_not_the_jwt_key():
+    # CURSOR_KEY未設定時もJWT_KEYそのものではなく導出した鍵で署名する
+    assert cursor.CURSOR_KEY != os.environ["JWT_KEY"].encode("utf-8")
+    assert len(cursor.CURSOR_KEY) == 32
+
+
+def test_cursor_signed_with_another_key_is_rejected(monkeypatch):
+    lek = {"PK": "POST#p1", "SK": "COMMENT#0190b0e4-7c1a-7000-8000-000000000001"}
+    token = encode_cursor(CursorKind.COMMENTS, "p1", lek)
+    assert decode_cursor(CursorKind.COMMENTS, "p1", token) == lek
+
+    monkeypatch.setattr(cursor, "CURSOR_KEY", b"another-key")
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(CursorKind.COMMENTS, "p1", token)
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+from app import db_metrics
+
+
+def _call(operation: str, parsed: dict) -> None:
+    model = SimpleNamespace(name=operation)
+    context = {}
+    params = {}
+    db_metrics._request_consumed_capacity(params=params, model=model)
+    assert params["ReturnConsumedCapacity"] == "TOTAL"
+    db_metrics._start_timer(context=context)
+    db_metrics._record_call(parsed=parsed, model=model, context=context)
+
+
+def test_transact_write_capacity_is_reported_as_wcu():
+    metrics = db_metrics.RequestDbMetrics()
+    token = db_metrics._current.set(metrics)
+    try:
+        # Transact系はテーブルごとのlistで返る
+        _call(
+            "TransactWriteItems",
+            {
+                "ConsumedCapacity": [
+                    {
+                        "TableName": "MugenRecoTable",
+                        "CapacityUnits": 4.0,
+                        "WriteCapacityUnits": 4.0,
+                    }
+                ]
+            },
+        )
+        # CapacityUnitsしかない場合はオペレーションの種類で振り分ける
+        _call(
+            "GetItem",
+            {"ConsumedCapacity": {"TableName": "MugenRecoTable", "CapacityUnits": 0.5}},
+        )
+    finally:
+        db_metrics._current.reset(token)
+
+    assert metrics.calls == {"TransactWriteItems": 1, "GetItem": 1}
+    assert metrics.read_capacity == 0.5
+    assert metrics.write_capacity == 4.0
+    assert 'rcu=0.5 wcu=4"' in db_metrics._server_timing(metrics)
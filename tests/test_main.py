@@ -0,0 +1,13 @@
+import app.main as main
+
+
+def test_cache_stats_is_hidden_on_prod_stage(client, monkeypatch):
+    monkeypatch.setattr(main, "STAGE", "prod")
+
+    assert client.get("/cache-stats").status_code == 404
+
+
+def test_cache_stats_is_available_outside_prod(client, monkeypatch):
+    monkeypatch.setattr(main, "STAGE", "dev")
+
+    assert client.get("/cache-stats").status_code == 200
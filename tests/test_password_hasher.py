@@ -0,0 +1,41 @@
+from fastapi_csrf_protect import CsrfProtect
+import app.auth.password_hasher as password_hasher
+import app.cruds.crud_user as crud_user
+import app.main as main
+
+
+class _PassThroughCsrf:
+    def get_csrf_from_headers(self, headers):
+        return None
+
+    def validate_csrf(self, csrf_token):
+        return None
+
+
+def test_login_returns_503_when_password_hasher_is_saturated(client, monkeypatch):
+    monkeypatch.setattr(
+        crud_user,
+        "db_get_user_by_username",
+        lambda username: {"username": username, "password": "hashed"},
+    )
+    # 実行中＋待ちが上限に達している状態にする
+    monkeypatch.setattr(
+        password_hasher, "_pending", password_hasher.PASSWORD_HASH_MAX_PENDING
+    )
+    main.app.dependency_overrides[CsrfProtect] = _PassThroughCsrf
+    try:
+        res = client.post(
+            "/api/login", json={"username": "user1", "password": "Password123"}
+        )
+    finally:
+        main.app.dependency_overrides.pop(CsrfProtect, None)
+
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "1"
+    assert res.json()["error"] == "PASSWORD_HASHER_BUSY"
+
+
+def test_password_hash_stats_is_hidden_on_prod_stage(client, monkeypatch):
+    monkeypatch.setattr(main, "STAGE", "prod")
+
+    assert client.get("/password-hash-stats").status_code == 404
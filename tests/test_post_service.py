@@ -0,0 +1,40 @@
+from app.cruds.crud_like import BATCH_GET_MAX_KEYS
+from app.exceptions import DatabaseError
+from app.services import post_service
+from app.services.post_service import PostService
+
+
+def test_add_like_status_degrades_failed_chunk_and_keeps_like_count(monkeypatch):
+    # BatchGetItemの上限を超える件数で、2つ目のチャンクだけ失敗させる
+    posts = [
+        {"post_id": f"p{i}", "like_count": i} for i in range(BATCH_GET_MAX_KEYS + 20)
+    ]
+    chunks = []
+
+    def fake_get_like_statuses(post_ids, username):
+        chunks.append(list(post_ids))
+        if len(chunks) == 2:
+            raise DatabaseError(message="throttled")
+        return {post_id: post_id == "p1" for post_id in post_ids}
+
+    monkeypatch.setattr(post_service, "db_get_like_statuses", fake_get_like_statuses)
+
+    PostService._add_like_status(posts, "alice")
+
+    assert [len(chunk) for chunk in chunks] == [BATCH_GET_MAX_KEYS, 20]
+    assert posts[1] == {"post_id": "p1", "like_count": 1, "is_liked": True}
+    assert posts[2]["is_liked"] is False
+    assert all(post["is_liked"] is False for post in posts[BATCH_GET_MAX_KEYS:])
+    assert posts[-1]["like_count"] == BATCH_GET_MAX_KEYS + 19
+
+
+def test_add_like_status_skips_fetch_when_logged_out(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("should not be called")
+
+    monkeypatch.setattr(post_service, "db_get_like_statuses", fail)
+    posts = [{"post_id": "p1"}]
+
+    PostService._add_like_status(posts, None)
+
+    assert posts == [{"post_id": "p1", "is_liked": False}]
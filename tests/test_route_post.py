@@ -0,0 +1,82 @@
+def test_get_posts_with_corrupted_cursor_returns_400(client):
+    res = client.get("/api/posts", params={"last_evaluated_key": "not-a-cursor"})
+
+    assert res.status_code == 400
+    body = res.json()
+    assert body["error"] == "INVALID_CURSOR"
+    assert body["timestamp"].endswith("Z")
+
+
+def test_single_post_etag_changes_after_comment_is_created(client, monkeypatch):
+    from types import SimpleNamespace
+    import app.cruds.crud_comment as crud_comment
+    from app.services.post_service import PostService
+
+    post = {
+        "post_id": "p1",
+        "username": "user1",
+        "category": "anime",
+        "title": "title",
+        "description": None,
+        "recommend1": "a",
+        "recommend2": "b",
+        "recommend3": "c",
+        "like_count": 0,
+        "comment_count": 0,
+        "is_liked": False,
+        "created_at": "2025-01-01T00:00:00+00:00",
+        "updated_at": "2025-01-01T00:00:00+00:00",
+    }
+
+    def transact_write_items(TransactItems):
+        # 投稿METAへの ADD comment_count :delta を反映する
+        for item in TransactItems:
+            if "Update" in item:
+                values = item["Update"]["ExpressionAttributeValues"]
+                post["comment_count"] += values[":delta"]
+
+    full_reads = []
+
+    def get_single_post_with_like_info(post_id, username, is_liked=None):
+        full_reads.append(post_id)
+        return dict(post)
+
+    def get_single_post_version(post_id, username):
+        return {
+            key: post[key]
+            for key in ("updated_at", "like_count", "comment_count", "is_liked")
+        }
+
+    monkeypatch.setattr(
+        PostService,
+        "get_single_post_with_like_info",
+        staticmethod(get_single_post_with_like_info),
+    )
+    monkeypatch.setattr(
+        PostService, "get_single_post_version", staticmethod(get_single_post_version)
+    )
+    monkeypatch.setattr(
+        crud_comment,
+        "table",
+        SimpleNamespace(
+            table_name="MugenRecoTable",
+            meta=SimpleNamespace(
+                client=SimpleNamespace(transact_write_items=transact_write_items)
+            ),
+        ),
+    )
+
+    first = client.get("/api/posts/p1")
+    etag = first.headers["ETag"]
+    cached = client.get("/api/posts/p1", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    # 304ではETag用の射影読み取りだけで、本文を含む読み取りはしない
+    assert full_reads == ["p1"]
+
+    crud_comment.db_create_comment("user2", "p1", SimpleNamespace(comment="hello"))
+
+    res = client.get("/api/posts/p1", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert res.json()["comment_count"] == 1
+    assert full_reads == ["p1", "p1"]